@@ -0,0 +1,172 @@
+"""
+ASGI Entry Point
+
+Serves the backend under an ASGI server (`uvicorn asgi:app`). GET
+/api/departures and /api/departures/stream are handled natively on the event
+loop: upstream calls go through the plugins' non-blocking clients and open
+streams are coroutines, so waiting on Metrolinx, GRT or the next board holds
+no thread. Every other route is passed to the Flask app through asgiref's
+WSGI adapter. `python server.py` still runs the plain Flask server, but
+without the stream (boards fall back to polling /api/departures there).
+"""
+
+import asyncio
+import json
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import server
+
+flask_app = WsgiToAsgi(server.app)
+
+# What Flask-CORS adds to the Flask routes
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-expose-headers', b'X-Partial-Networks, X-Scheduled-Networks'),
+]
+
+
+def _header(scope: Dict, name: bytes) -> str:
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+async def _stop_ids(scope: Dict):
+    params = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    # Station lookups may reload the registry from disk, so keep them off the loop
+    return await asyncio.to_thread(
+        server.stop_ids_from_params, params.get('stops', [''])[0], params.get('station', [''])[0]
+    )
+
+
+async def _send_json(send, body, status: int = 200, headers: List[Tuple[bytes, bytes]] = ()):
+    # Same encoding as Flask's jsonify
+    payload = json.dumps(body, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            *CORS_HEADERS,
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def departures(scope: Dict, receive, send):
+    """Async /api/departures: same parameters and payload as the Flask route"""
+    stop_ids, error = await _stop_ids(scope)
+    if error:
+        body, status = error
+        return await _send_json(send, body, status)
+
+    if server.departure_poller:
+        server.departure_poller.record_request(stop_ids)
+
+    departures_result = await server.plugin_manager.fetch_departures_async(stop_ids)
+    # Merging in scheduled departures reads the GTFS store, so it runs off the loop
+    result = await asyncio.to_thread(server.group_departures, stop_ids, departures_result)
+
+    # Flag networks that errored or missed the deadline without changing the payload shape
+    headers = []
+    if departures_result.partial:
+        headers.append((b'x-partial-networks', ','.join(departures_result.incomplete_networks).encode()))
+    if departures_result.scheduled_networks:
+        headers.append((b'x-scheduled-networks', ','.join(departures_result.scheduled_networks).encode()))
+    await _send_json(send, result, headers=headers)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def departure_stream(scope: Dict, receive, send):
+    """Async /api/departures/stream: a coroutine per subscriber instead of a thread"""
+    stop_ids, error = await _stop_ids(scope)
+    if error:
+        body, status = error
+        return await _send_json(send, body, status)
+
+    loop = asyncio.get_running_loop()
+    updated = asyncio.Event()
+    subscription = server.departure_stream.subscribe(
+        stop_ids, on_update=lambda: loop.call_soon_threadsafe(updated.set)
+    )
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *CORS_HEADERS,
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        while True:
+            board_ready = asyncio.ensure_future(updated.wait())
+            await asyncio.wait({board_ready, disconnected}, timeout=server.STREAM_KEEPALIVE,
+                               return_when=asyncio.FIRST_COMPLETED)
+            board_ready.cancel()
+            if disconnected.done():
+                break
+
+            updated.clear()
+            board = subscription.take()
+            if board is None:
+                chunk = b': keepalive\n\n'
+            else:
+                etag, body = board
+                chunk = b'id: ' + etag.encode() + b'\ndata: ' + body + b'\n\n'
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        disconnected.cancel()
+        server.departure_stream.unsubscribe(subscription)
+
+
+NATIVE_ROUTES = {
+    '/api/departures': departures,
+    '/api/departures/stream': departure_stream,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Close each plugin's pooled async client on the loop that owns it
+            for plugin in server.plugin_manager.plugins.values():
+                await plugin.aclose_async_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Dict, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    handler = NATIVE_ROUTES.get(scope.get('path')) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if handler is None:
+        return await flask_app(scope, receive, send)
+
+    # Same checks as requires_api_key
+    api_key = _header(scope, b'x-api-key')
+    if not api_key:
+        return await _send_json(send, {'error': 'API key is required'}, 401)
+    if api_key != server.API_KEY:
+        return await _send_json(send, {'error': 'Invalid API key'}, 401)
+
+    await handler(scope, receive, send)
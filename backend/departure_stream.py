@@ -0,0 +1,159 @@
+"""
+Departure Stream
+
+Server-pushed departure boards. Subscribers register for a stop set; one
+background refresher rebuilds each subscribed stop set once per interval
+(however many boards are watching it) and pushes the encoded board to every
+subscriber, only when it differs from the last one sent.
+
+Subscriptions hold just the latest board: a slow client skips intermediate
+boards instead of queueing them. They wake the subscriber's event loop through
+on_update, so the refresher is the only thread doing work regardless of how
+many connections are open.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+StopSet = Tuple[str, ...]
+
+
+def stop_set(stop_ids: Iterable[str]) -> StopSet:
+    """Canonical key for a set of prefixed stop IDs"""
+    return tuple(sorted(set(stop_ids)))
+
+
+class Subscription:
+    """One subscriber's view of a stop set: the latest board not yet taken"""
+
+    def __init__(self, stops: StopSet, on_update: Optional[Callable[[], None]] = None):
+        self.stops = stops
+        self.on_update = on_update
+        self._board: Optional[Tuple[str, bytes]] = None
+        self._lock = threading.Lock()
+
+    def push(self, etag: str, body: bytes):
+        with self._lock:
+            self._board = (etag, body)
+        if self.on_update:
+            self.on_update()
+
+    def take(self) -> Optional[Tuple[str, bytes]]:
+        """(etag, body) of a board not yet taken, or None"""
+        with self._lock:
+            board, self._board = self._board, None
+            return board
+
+
+class _Topic:
+    """Subscribers of one stop set and the last board sent to them"""
+
+    def __init__(self):
+        self.subscriptions: Set[Subscription] = set()
+        self.etag: Optional[str] = None
+        self.body: Optional[bytes] = None
+
+
+class DepartureStream:
+    """Shares one refresh per stop set per interval among all of its subscribers"""
+
+    def __init__(self, build_board: Callable[[List[str]], object], interval: float = 15,
+                 max_workers: int = 4):
+        self.build_board = build_board
+        self.interval = interval
+        self._topics: Dict[StopSet, _Topic] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stream-refresh')
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_running(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='departure-stream', daemon=True)
+        self._thread.start()
+
+    def subscribe(self, stop_ids: Iterable[str], on_update: Optional[Callable[[], None]] = None) -> Subscription:
+        """Subscribe to a stop set; the current board (if any) is delivered straight away"""
+        subscription = Subscription(stop_set(stop_ids), on_update)
+        with self._lock:
+            topic = self._topics.setdefault(subscription.stops, _Topic())
+            topic.subscriptions.add(subscription)
+            etag, body = topic.etag, topic.body
+            self._ensure_running()
+
+        if body is not None:
+            subscription.push(etag, body)
+        else:
+            self._wake.set()  # New stop set: build it now rather than at the next cycle
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            topic = self._topics.get(subscription.stops)
+            if topic:
+                topic.subscriptions.discard(subscription)
+                if not topic.subscriptions:
+                    del self._topics[subscription.stops]
+
+    def _refresh(self, stops: StopSet):
+        board = self.build_board(list(stops))
+        body = json.dumps(board, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+
+        with self._lock:
+            topic = self._topics.get(stops)
+            if topic is None or topic.etag == etag:
+                return
+            topic.etag, topic.body = etag, body
+            subscriptions = list(topic.subscriptions)
+
+        for subscription in subscriptions:
+            subscription.push(etag, body)
+
+    def refresh_all(self):
+        """Rebuild every subscribed stop set once, pushing boards that changed"""
+        with self._lock:
+            stop_sets = list(self._topics)
+        futures = {stops: self._executor.submit(self._refresh, stops) for stops in stop_sets}
+        wait(futures.values())
+        for stops, future in futures.items():
+            if future.exception():
+                print(f"Departure stream: error refreshing {','.join(stops)}: {future.exception()}")
+
+    def _refresh_new(self):
+        """Build stop sets that have subscribers but no board yet"""
+        with self._lock:
+            new_sets = [stops for stops, topic in self._topics.items() if topic.body is None]
+        for stops in new_sets:
+            try:
+                self._refresh(stops)
+            except Exception as e:
+                print(f"Departure stream: error refreshing {','.join(stops)}: {e}")
+
+    def _run(self):
+        next_cycle = time.monotonic()
+        while True:
+            if self._wake.wait(max(0, next_cycle - time.monotonic())):
+                self._wake.clear()
+                self._refresh_new()
+                continue
+
+            with self._lock:
+                if not self._topics:
+                    self._thread = None
+                    return
+            self.refresh_all()
+            next_cycle = time.monotonic() + self.interval
+
+    def status(self) -> List[Dict]:
+        """Subscriber count per stop set"""
+        with self._lock:
+            return [
+                {'stops': list(stops), 'subscribers': len(topic.subscriptions), 'etag': topic.etag}
+                for stops, topic in self._topics.items()
+            ]
@@ -1,19 +1,80 @@
 """
 GTFS Static Schedule Integration
 
-FIXME: This module is currently duplicating departures instead of properly 
-deduplicating them. Needs debugging of the merge logic and departure key 
-matching before re-enabling.
-
-Always integrates GTFS static schedule data with real-time departures to provide
+Integrates GTFS static schedule data with real-time departures to provide
 a complete departure schedule. Handles deduplication and time windowing.
+
+Scheduled departures are matched against real-time ones by trip_id when both
+carry one, and otherwise by stop, route and direction (headsign) within
+MERGE_TOLERANCE_SECONDS, using per-group sorted departure times.
+
+Stop times are read from the schedule store scripts/compile_gtfs.py builds
+for each agency, with an indexed range query; stop_times.txt is never parsed
+at request time. Agencies without a compiled store have no static departures.
 """
 
 import csv
+import math
 import os
-from datetime import datetime, timedelta, time
-from typing import List, Dict, Optional, Set
+import re
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, time
+from typing import FrozenSet, Iterator, List, Dict, Optional, Set, Tuple
 import pytz
+from gtfs_store import GTFSStore, STORE_FILENAME, WEEKDAY_COLUMNS
+from gtfs_tables import CompactTable, ROUTE_COLUMNS, TRIP_COLUMNS
+
+
+def _field(departure: Dict, snake_name: str, camel_name: str, default=None):
+    """Read a departure field in either the static (snake_case) or API (camelCase) shape."""
+    value = departure.get(snake_name)
+    if value is None:
+        value = departure.get(camel_name, default)
+    return value
+
+
+# Single-letter branch prefix, as in "A - Fairway Station"
+BRANCH_PREFIX = re.compile(r'^[A-Za-z]\s*-\s*')
+
+
+def _direction_name(headsign: str) -> str:
+    """Headsign normalized for matching: no branch prefix, case or spacing differences."""
+    headsign = BRANCH_PREFIX.sub('', (headsign or '').strip())
+    return ' '.join(headsign.split()).lower()
+
+
+def _route_key(departure: Dict) -> Tuple[str, str, str]:
+    """(network, stop ID without the network prefix, route number)"""
+    network = _field(departure, 'route_network', 'routeNetwork', '')
+    stop_id = str(_field(departure, 'stop_id', 'stopId', ''))
+    if stop_id.startswith(f"{network}_"):
+        stop_id = stop_id[len(network) + 1:]
+    return network, stop_id, str(_field(departure, 'route_number', 'routeNumber', ''))
+
+
+class _DepartureSlots:
+    """Sorted real-time departure times for one route/direction; each can be claimed once."""
+    
+    def __init__(self, timestamps: List[int]):
+        self.times = sorted(timestamps)
+        # _next[i] is the first unclaimed slot at or after i (path-compressed skip list)
+        self._next = list(range(len(self.times) + 1))
+    
+    def _unclaimed(self, index: int) -> int:
+        root = index
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[index] != root:
+            self._next[index], index = root, self._next[index]
+        return root
+    
+    def claim(self, timestamp: int, tolerance: int) -> bool:
+        """Claim the earliest unclaimed time within tolerance of timestamp."""
+        index = self._unclaimed(bisect_left(self.times, timestamp - tolerance))
+        if index < len(self.times) and self.times[index] <= timestamp + tolerance:
+            self._next[index] = index + 1
+            return True
+        return False
 
 
 class GTFSScheduler:
@@ -24,19 +85,73 @@ class GTFSScheduler:
         # Look-ahead window for static schedules (in hours)
         self.SCHEDULE_LOOKAHEAD_HOURS = 3
         
-        # Cache for GTFS data to avoid repeated file reads
+        # How far a real-time departure may be from the schedule and still be the same trip
+        self.MERGE_TOLERANCE_SECONDS = 10 * 60
+        
+        # Cache for GTFS data to avoid repeated file reads; trips and routes are
+        # CompactTables, loaded on first use
         self._routes_cache = {}
         self._trips_cache = {}
+        self._calendar_cache = {}
         self._calendar_dates_cache = {}
         
-    def _load_routes(self, agency: str) -> Dict:
+        # Active service_ids per (agency, service date); dates before yesterday are dropped
+        self._active_services_cache: Dict[Tuple[str, date], FrozenSet[str]] = {}
+        
+        # Compiled schedule stores (scripts/compile_gtfs.py) per agency as (store file
+        # mtime, store or None), re-checked whenever the file's mtime changes
+        self._stores: Dict[str, Tuple[Optional[float], Optional[GTFSStore]]] = {}
+        # Agencies already reported as having no compiled store
+        self._missing_stores_logged: Set[str] = set()
+        
+    def _feed_dir(self, agency: str) -> str:
+        gtfs_dir = f'{agency}_GTFS' if agency == 'GRT' else f'{agency}-GTFS'
+        return os.path.join(self.gtfs_data_dir, gtfs_dir)
+    
+    def _get_store(self, agency: str) -> Optional[GTFSStore]:
+        """The agency's compiled schedule store, if one has been built (picked up again when rebuilt)."""
+        store_path = os.path.join(self._feed_dir(agency), STORE_FILENAME)
+        try:
+            mtime = os.stat(store_path).st_mtime
+        except OSError:
+            mtime = None
+        
+        cached = self._stores.get(agency)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        store = GTFSStore.open(store_path) if mtime is not None else None
+        if cached:
+            previous = cached[1]
+            # A different build (or a store appearing or going away) invalidates what was loaded before
+            if (store.source_mtime if store else None) != (previous.source_mtime if previous else None):
+                self._drop_agency_caches(agency)
+        self._stores[agency] = (mtime, store)
+        return store
+    
+    def has_store(self, agency: str) -> bool:
+        """Whether scripts/compile_gtfs.py has built a schedule store for the agency."""
+        return self._get_store(agency) is not None
+    
+    def _drop_agency_caches(self, agency: str):
+        """Forget an agency's loaded tables so they are read again from the new source."""
+        for cache in (self._routes_cache, self._trips_cache, self._calendar_cache, self._calendar_dates_cache):
+            cache.pop(agency, None)
+        for key in [k for k in self._active_services_cache if k[0] == agency]:
+            self._active_services_cache.pop(key, None)
+    
+    def _load_routes(self, agency: str) -> CompactTable:
         """Load and cache routes for an agency."""
+        store = self._get_store(agency)  # Also drops cached tables when the store is rebuilt
         if agency in self._routes_cache:
             return self._routes_cache[agency]
             
-        routes = {}
-        gtfs_dir = f'{agency}_GTFS' if agency == 'GRT' else f'{agency}-GTFS'
-        routes_file = os.path.join(self.gtfs_data_dir, gtfs_dir, 'routes.txt')
+        if store:
+            routes = self._routes_cache[agency] = store.load_routes()
+            return routes
+            
+        routes = CompactTable(ROUTE_COLUMNS)
+        routes_file = os.path.join(self._feed_dir(agency), 'routes.txt')
         
         if not os.path.exists(routes_file):
             self._routes_cache[agency] = routes
@@ -45,27 +160,24 @@ class GTFSScheduler:
         try:
             with open(routes_file, 'r', encoding='utf-8-sig') as f:
                 reader = csv.DictReader(f)
-                for row in reader:
-                    routes[row['route_id']] = {
-                        'route_short_name': row.get('route_short_name', ''),
-                        'route_long_name': row.get('route_long_name', ''),
-                        'route_color': row.get('route_color', ''),
-                        'route_text_color': row.get('route_text_color', ''),
-                    }
+                routes = CompactTable(ROUTE_COLUMNS, (
+                    (row['route_id'], [row.get(column, '') for column in ROUTE_COLUMNS])
+                    for row in reader
+                ))
         except Exception as e:
             print(f"Error loading routes for {agency}: {e}")
             
         self._routes_cache[agency] = routes
         return routes
     
-    def _load_trips(self, agency: str) -> Dict:
+    def _load_trips(self, agency: str) -> CompactTable:
         """Load and cache trips for an agency."""
+        self._get_store(agency)  # Drops cached tables when the store is rebuilt
         if agency in self._trips_cache:
             return self._trips_cache[agency]
             
-        trips = {}
-        gtfs_dir = f'{agency}_GTFS' if agency == 'GRT' else f'{agency}-GTFS'
-        trips_file = os.path.join(self.gtfs_data_dir, gtfs_dir, 'trips.txt')
+        trips = CompactTable(TRIP_COLUMNS)
+        trips_file = os.path.join(self._feed_dir(agency), 'trips.txt')
         
         if not os.path.exists(trips_file):
             self._trips_cache[agency] = trips
@@ -74,27 +186,65 @@ class GTFSScheduler:
         try:
             with open(trips_file, 'r', encoding='utf-8-sig') as f:
                 reader = csv.DictReader(f)
-                for row in reader:
-                    trips[row['trip_id']] = {
-                        'route_id': row.get('route_id', ''),
-                        'service_id': row.get('service_id', ''),
-                        'trip_headsign': row.get('trip_headsign', ''),
-                        'direction_id': row.get('direction_id', ''),
-                    }
+                trips = CompactTable(TRIP_COLUMNS, (
+                    (row['trip_id'], [row.get(column, '') for column in TRIP_COLUMNS])
+                    for row in reader
+                ))
         except Exception as e:
             print(f"Error loading trips for {agency}: {e}")
             
         self._trips_cache[agency] = trips
         return trips
     
+    def get_trip(self, agency: str, trip_id: str) -> Optional[Dict]:
+        """Static trips.txt row (route_id, service_id, trip_headsign, direction_id) for a trip, if known."""
+        return self._load_trips(agency).get(trip_id)
+    
+    def get_route(self, agency: str, route_id: str) -> Optional[Dict]:
+        """Static routes.txt row (short/long name and colours) for a route, if known."""
+        return self._load_routes(agency).get(route_id)
+    
+    def _load_calendar(self, agency: str) -> Dict:
+        """Load and cache calendar.txt: {service_id: (weekday flags Monday..Sunday, start_date, end_date)}."""
+        store = self._get_store(agency)  # Also drops cached tables when the store is rebuilt
+        if agency in self._calendar_cache:
+            return self._calendar_cache[agency]
+            
+        if store:
+            calendar = self._calendar_cache[agency] = store.load_calendar()
+            return calendar
+            
+        calendar = {}
+        calendar_file = os.path.join(self._feed_dir(agency), 'calendar.txt')
+        
+        if not os.path.exists(calendar_file):
+            self._calendar_cache[agency] = calendar
+            return calendar
+            
+        try:
+            with open(calendar_file, 'r', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    weekdays = tuple(row.get(day) == '1' for day in WEEKDAY_COLUMNS)
+                    calendar[row['service_id']] = (weekdays, row['start_date'], row['end_date'])
+        except Exception as e:
+            print(f"Error loading calendar for {agency}: {e}")
+            
+        self._calendar_cache[agency] = calendar
+        return calendar
+    
     def _load_calendar_dates(self, agency: str) -> Dict:
         """Load and cache calendar dates for an agency."""
+        store = self._get_store(agency)  # Also drops cached tables when the store is rebuilt
         if agency in self._calendar_dates_cache:
             return self._calendar_dates_cache[agency]
             
+        if store:
+            calendar_dates = self._calendar_dates_cache[agency] = store.load_calendar_dates()
+            return calendar_dates
+            
         calendar_dates = {}
-        gtfs_dir = f'{agency}_GTFS' if agency == 'GRT' else f'{agency}-GTFS'
-        calendar_file = os.path.join(self.gtfs_data_dir, gtfs_dir, 'calendar_dates.txt')
+        calendar_file = os.path.join(self._feed_dir(agency), 'calendar_dates.txt')
         
         if not os.path.exists(calendar_file):
             self._calendar_dates_cache[agency] = calendar_dates
@@ -117,41 +267,71 @@ class GTFSScheduler:
         self._calendar_dates_cache[agency] = calendar_dates
         return calendar_dates
     
-    def _is_service_active(self, agency: str, service_id: str, date_str: str) -> bool:
-        """Check if a service is active on a given date."""
-        calendar_dates = self._load_calendar_dates(agency)
+    def _active_services(self, agency: str, service_date: date) -> FrozenSet[str]:
+        """
+        service_ids running on service_date: calendar.txt weekday ranges plus
+        calendar_dates.txt exceptions. Computed once per agency and day.
+        """
+        self._get_store(agency)  # Drops cached sets when the store is rebuilt
+        key = (agency, service_date)
+        active = self._active_services_cache.get(key)
+        if active is not None:
+            return active
         
-        if service_id in calendar_dates and date_str in calendar_dates[service_id]:
-            # exception_type: 1 = service added, 2 = service removed
-            return calendar_dates[service_id][date_str] == 1
+        date_str = service_date.strftime('%Y%m%d')
+        weekday = service_date.weekday()
         
-        return False
+        services = {
+            service_id
+            for service_id, (weekdays, start_date, end_date) in self._load_calendar(agency).items()
+            if weekdays[weekday] and start_date <= date_str <= end_date
+        }
+        
+        # exception_type: 1 = service added, 2 = service removed
+        for service_id, exceptions in self._load_calendar_dates(agency).items():
+            exception_type = exceptions.get(date_str)
+            if exception_type == 1:
+                services.add(service_id)
+            elif exception_type == 2:
+                services.discard(service_id)
+        
+        active = frozenset(services)
+        
+        # Keep the yesterday/today/tomorrow window get_static_departures uses on every call
+        today = datetime.now(self.toronto_tz).date()
+        oldest, newest = today - timedelta(days=1), today + timedelta(days=1)
+        for stale_key in [k for k in self._active_services_cache if k[0] == agency and not oldest <= k[1] <= newest]:
+            self._active_services_cache.pop(stale_key, None)
+        
+        self._active_services_cache[key] = active
+        return active
     
-    def _parse_gtfs_time(self, time_str: str) -> Optional[time]:
-        """Parse GTFS time format (HH:MM:SS) which can exceed 24 hours."""
-        try:
-            parts = time_str.split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = int(parts[2])
-            
-            # Handle times >= 24:00:00 (next day service)
-            if hours >= 24:
-                hours = hours % 24
-                
-            return time(hours, minutes, seconds)
-        except (ValueError, IndexError):
-            return None
+    def _service_day_start(self, service_date: date) -> datetime:
+        """GTFS times are measured from noon minus 12h on the service day (midnight except across DST changes)."""
+        noon = self.toronto_tz.localize(datetime.combine(service_date, time(12)))
+        return noon - timedelta(hours=12)
     
-    def _create_departure_key(self, departure: Dict) -> str:
-        """Create a unique key for departure deduplication."""
-        # Use route, headsign, and rounded time for matching
-        # Handle both real-time format (routeNumber) and static format (route_number)
-        route = departure.get('routeNumber', departure.get('route_number', ''))
-        headsign = departure.get('headsign', '').lower().strip()
-        time_str = departure.get('time', '')
-        
-        return f"{route}|{headsign}|{time_str}"
+    def _stop_times(self, agency: str, original_stop_id: str,
+                    windows: List[Tuple[int, int]]) -> Iterator[Tuple[int, str, int, Dict]]:
+        """
+        (window index, trip_id, departure seconds, trip info) for scheduled departures at a
+        stop with after < departure seconds <= until for one of the (after, until) windows.
+        Each window is an indexed range query on the compiled store; nothing is
+        yielded without one.
+        """
+        store = self._get_store(agency)
+        if not store:
+            return
+        
+        for index, (after_seconds, until_seconds) in enumerate(windows):
+            rows = store.stop_departures(original_stop_id, after_seconds, until_seconds)
+            for trip_id, departure_seconds, route_id, service_id, trip_headsign, direction_id in rows:
+                yield index, trip_id, departure_seconds, {
+                    'route_id': route_id,
+                    'service_id': service_id,
+                    'trip_headsign': trip_headsign,
+                    'direction_id': direction_id,
+                }
     
     def get_static_departures(self, stop_ids: List[str]) -> List[Dict]:
         """
@@ -164,9 +344,22 @@ class GTFSScheduler:
             List of departure dictionaries from static schedules
         """
         all_departures = []
-        current_datetime = self.toronto_tz.localize(datetime.now())
+        current_datetime = datetime.now(self.toronto_tz)
         end_datetime = current_datetime + timedelta(hours=self.SCHEDULE_LOOKAHEAD_HOURS)
-        current_date_str = current_datetime.strftime('%Y%m%d')
+        
+        # Yesterday's trips can still be running past 24:00:00 and tomorrow's can start
+        # inside the window, so look at each service day with its own active services
+        service_days = []
+        windows = []
+        for day_offset in (-1, 0, 1):
+            service_date = current_datetime.date() + timedelta(days=day_offset)
+            day_start = self._service_day_start(service_date)
+            after_seconds = math.floor((current_datetime - day_start).total_seconds())
+            until_seconds = math.floor((end_datetime - day_start).total_seconds())
+            if until_seconds < 0:
+                continue
+            service_days.append((service_date, day_start))
+            windows.append((after_seconds, until_seconds))
         
         for stop_id in stop_ids:
             try:
@@ -176,80 +369,57 @@ class GTFSScheduler:
                     
                 agency, original_stop_id = stop_id.split('_', 1)
                 
+                # Stop times come only from a compiled store, never stop_times.txt
+                if not self.has_store(agency):
+                    if agency not in self._missing_stores_logged:
+                        self._missing_stores_logged.add(agency)
+                        print(f"No compiled schedule store for {agency}; run scripts/compile_gtfs.py for static departures")
+                    continue
+                
                 # Load necessary data
                 routes = self._load_routes(agency)
-                trips = self._load_trips(agency)
-                
-                # Load stop times
-                gtfs_dir = f'{agency}_GTFS' if agency == 'GRT' else f'{agency}-GTFS'
-                stop_times_file = os.path.join(self.gtfs_data_dir, gtfs_dir, 'stop_times.txt')
-                
-                if not os.path.exists(stop_times_file):
-                    continue
+                active_services = [self._active_services(agency, service_date) for service_date, _ in service_days]
                 
-                with open(stop_times_file, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
+                for window, trip_id, departure_seconds, trip_info in self._stop_times(agency, original_stop_id, windows):
+                    # Check if service runs on this service day
+                    if trip_info['service_id'] not in active_services[window]:
+                        continue
+                    
+                    # Create departure datetime
+                    day_start = service_days[window][1]
+                    departure_datetime = self.toronto_tz.normalize(day_start + timedelta(seconds=departure_seconds))
+                    
+                    # Get route info
+                    route_id = trip_info['route_id']
+                    route_info = routes.get(route_id, {})
+                    
+                    # Calculate countdown
+                    countdown_seconds = (departure_datetime - current_datetime).total_seconds()
+                    countdown_minutes = max(1, int(countdown_seconds / 60))
+                    
+                    # Format time
+                    formatted_time = departure_datetime.strftime('%H:%M')
+                    
+                    # Create departure object
+                    departure = {
+                        'stop_id': stop_id,
+                        'route_number': route_info.get('route_short_name', route_id),
+                        'headsign': trip_info.get('trip_headsign', ''),
+                        'platform': '',
+                        'route_network': agency,
+                        'time': formatted_time,
+                        'countdown': countdown_minutes,
+                        'branch_code': '',
+                        'route_color': route_info.get('route_color', ''),
+                        'route_text_color': route_info.get('route_text_color', ''),
+                        'trip_id': trip_id,
+                        'direction_id': trip_info.get('direction_id', ''),
+                        'departure_timestamp': int(departure_datetime.timestamp()),
+                        'is_static': True
+                    }
+                    
+                    all_departures.append(departure)
                     
-                    for row in reader:
-                        # Check if this is for our stop
-                        if row['stop_id'] != original_stop_id:
-                            continue
-                        
-                        trip_id = row['trip_id']
-                        departure_time_str = row['departure_time']
-                        
-                        # Parse departure time
-                        departure_time = self._parse_gtfs_time(departure_time_str)
-                        if not departure_time:
-                            continue
-                        
-                        # Get trip info
-                        if trip_id not in trips:
-                            continue
-                        
-                        trip_info = trips[trip_id]
-                        service_id = trip_info['service_id']
-                        
-                        # Check if service is active today
-                        if not self._is_service_active(agency, service_id, current_date_str):
-                            continue
-                        
-                        # Create departure datetime
-                        departure_datetime = datetime.combine(current_datetime.date(), departure_time)
-                        departure_datetime = self.toronto_tz.localize(departure_datetime)
-                        
-                        # Check if departure is within our time window
-                        if departure_datetime <= current_datetime or departure_datetime > end_datetime:
-                            continue
-                        
-                        # Get route info
-                        route_id = trip_info['route_id']
-                        route_info = routes.get(route_id, {})
-                        
-                        # Calculate countdown
-                        countdown_seconds = (departure_datetime - current_datetime).total_seconds()
-                        countdown_minutes = max(1, int(countdown_seconds / 60))
-                        
-                        # Format time
-                        formatted_time = departure_time.strftime('%H:%M')
-                        
-                        # Create departure object
-                        departure = {
-                            'stop_id': stop_id,
-                            'route_number': route_info.get('route_short_name', route_id),
-                            'headsign': trip_info.get('trip_headsign', ''),
-                            'platform': '',
-                            'route_network': agency,
-                            'time': formatted_time,
-                            'countdown': countdown_minutes,
-                            'branch_code': '',
-                            'route_color': route_info.get('route_color', ''),
-                            'route_text_color': route_info.get('route_text_color', ''),
-                            'is_static': True
-                        }
-                        
-                        all_departures.append(departure)
-                        
             except Exception as e:
                 print(f"Error getting static departures for {stop_id}: {e}")
         
@@ -261,6 +431,16 @@ class GTFSScheduler:
         """
         Merge real-time and static departures, removing duplicates and maintaining order.
         
+        A scheduled departure is dropped when a real-time departure is the same trip
+        (trip_id), or, for departures without a shared trip_id, when a real-time departure
+        on the same stop, route and direction is within MERGE_TOLERANCE_SECONDS of it.
+        Unmatched scheduled departures earlier than the last real-time departure for their
+        route and direction are dropped too: the real-time feed covers that period, so
+        they were cancelled or are running far off schedule.
+        
+        Directions are compared by normalized headsign; when a headsign appears on only
+        one side, matching falls back to stop and route.
+        
         Args:
             realtime_departures: List of real-time departure objects
             static_departures: List of static schedule departure objects
@@ -268,23 +448,69 @@ class GTFSScheduler:
         Returns:
             Merged and deduplicated list of departures
         """
-        # Create sets of keys for deduplication
-        realtime_keys = set()
+        tolerance = self.MERGE_TOLERANCE_SECONDS
+        
+        static_trips = {
+            (_field(departure, 'route_network', 'routeNetwork', ''), trip_id)
+            for departure in static_departures
+            for trip_id in [_field(departure, 'trip_id', 'tripId')] if trip_id
+        }
+        
+        # Real-time departures not already matched by trip, grouped by route and direction
+        realtime_trips = set()
+        realtime_times: Dict[Tuple, List[int]] = {}
         for departure in realtime_departures:
-            key = self._create_departure_key(departure)
-            realtime_keys.add(key)
+            route_key = _route_key(departure)
+            trip_id = _field(departure, 'trip_id', 'tripId')
+            if trip_id and (route_key[0], trip_id) in static_trips:
+                realtime_trips.add((route_key[0], trip_id))
+                continue
+            timestamp = _field(departure, 'departure_timestamp', 'departureTimestamp')
+            if timestamp is not None:
+                direction_key = route_key + (_direction_name(departure.get('headsign', '')),)
+                realtime_times.setdefault(direction_key, []).append(timestamp)
+        
+        static_groups: Dict[Tuple, List[Dict]] = {}
+        for departure in static_departures:
+            route_key = _route_key(departure)
+            trip_id = _field(departure, 'trip_id', 'tripId')
+            if trip_id and (route_key[0], trip_id) in realtime_trips:
+                continue
+            direction_key = route_key + (_direction_name(departure.get('headsign', '')),)
+            static_groups.setdefault(direction_key, []).append(departure)
+        
+        # Directions seen on only one side are matched on stop and route alone
+        fallback_times: Dict[Tuple, List[int]] = {}
+        for direction_key, timestamps in realtime_times.items():
+            if direction_key not in static_groups:
+                fallback_times.setdefault(direction_key[:3], []).extend(timestamps)
+        fallback_groups: Dict[Tuple, List[Dict]] = {}
+        for direction_key, departures in static_groups.items():
+            if direction_key not in realtime_times:
+                fallback_groups.setdefault(direction_key[:3], []).extend(departures)
         
-        # Add static departures that don't duplicate real-time ones
         merged_departures = list(realtime_departures)
         
-        for static_departure in static_departures:
-            static_key = self._create_departure_key(static_departure)
-            
-            # Only add if not already covered by real-time data
-            if static_key not in realtime_keys:
-                merged_departures.append(static_departure)
+        for groups, times in (
+            ({key: group for key, group in static_groups.items() if key in realtime_times}, realtime_times),
+            (fallback_groups, fallback_times),
+        ):
+            for key, departures in groups.items():
+                timestamps = times.get(key)
+                if not timestamps:
+                    merged_departures.extend(departures)
+                    continue
+                
+                slots = _DepartureSlots(timestamps)
+                last_realtime = slots.times[-1]
+                for departure in sorted(departures, key=lambda d: _field(d, 'departure_timestamp', 'departureTimestamp', 0)):
+                    timestamp = _field(departure, 'departure_timestamp', 'departureTimestamp')
+                    if timestamp is None:
+                        merged_departures.append(departure)
+                    elif not slots.claim(timestamp, tolerance) and timestamp > last_realtime:
+                        merged_departures.append(departure)
         
         # Sort by countdown
         merged_departures.sort(key=lambda x: x.get('countdown', float('inf')))
         
-        return merged_departures
\ No newline at end of file
+        return merged_departures
@@ -0,0 +1,243 @@
+"""
+Compiled GTFS Schedule Store
+
+Compiles an agency's GTFS feed into a single SQLite file so GTFSScheduler can
+answer "departures at stop X between two times" with an index range scan
+instead of streaming stop_times.txt on every request.
+
+stop_times is stored WITHOUT ROWID with a (stop_id, departure_seconds, ...)
+primary key, so each stop's departures sit together in time order and a
+lookup is a binary search into that range. Departure times are seconds after
+midnight of the service day and may exceed 24h, as in GTFS.
+
+Build the stores with scripts/compile_gtfs.py.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from gtfs_tables import CompactTable, ROUTE_COLUMNS
+
+STORE_FILENAME = 'schedule.sqlite'
+
+# Bump when the schema changes; stores with another version are ignored
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE routes (
+    route_id TEXT PRIMARY KEY,
+    route_short_name TEXT NOT NULL,
+    route_long_name TEXT NOT NULL,
+    route_color TEXT NOT NULL,
+    route_text_color TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE trips (
+    trip_id TEXT PRIMARY KEY,
+    route_id TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    trip_headsign TEXT NOT NULL,
+    direction_id TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE calendar (
+    service_id TEXT PRIMARY KEY,
+    monday INTEGER NOT NULL,
+    tuesday INTEGER NOT NULL,
+    wednesday INTEGER NOT NULL,
+    thursday INTEGER NOT NULL,
+    friday INTEGER NOT NULL,
+    saturday INTEGER NOT NULL,
+    sunday INTEGER NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE calendar_dates (
+    service_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    exception_type INTEGER NOT NULL,
+    PRIMARY KEY (service_id, date)
+) WITHOUT ROWID;
+CREATE TABLE stop_times (
+    stop_id TEXT NOT NULL,
+    departure_seconds INTEGER NOT NULL,
+    trip_id TEXT NOT NULL,
+    stop_sequence INTEGER NOT NULL,
+    PRIMARY KEY (stop_id, departure_seconds, trip_id, stop_sequence)
+) WITHOUT ROWID;
+"""
+
+WEEKDAY_COLUMNS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Rows per executemany batch while compiling
+BATCH_SIZE = 50000
+
+
+def parse_gtfs_seconds(time_str: str) -> Optional[int]:
+    """Seconds after service-day midnight for a GTFS HH:MM:SS time (hours may be >= 24)."""
+    try:
+        parts = time_str.split(':')
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    except (ValueError, IndexError, AttributeError):
+        return None
+
+
+def _read_rows(file_path: str) -> Iterator[Dict[str, str]]:
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _batched(rows, size: int = BATCH_SIZE) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def source_mtime(feed_dir: str) -> float:
+    """Newest modification time of the feed files the store is built from."""
+    mtimes = [
+        os.stat(os.path.join(feed_dir, name)).st_mtime
+        for name in ('stop_times.txt', 'trips.txt', 'routes.txt', 'calendar.txt', 'calendar_dates.txt')
+        if os.path.exists(os.path.join(feed_dir, name))
+    ]
+    return max(mtimes, default=0.0)
+
+
+def compile_gtfs_store(feed_dir: str, store_path: Optional[str] = None) -> str:
+    """
+    Compile the GTFS feed in feed_dir into a SQLite store and return its path.
+    The store is built in a temporary file and moved into place when complete.
+    """
+    store_path = store_path or os.path.join(feed_dir, STORE_FILENAME)
+    temp_path = f"{store_path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(SCHEMA)
+
+        connection.executemany('INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?)', (
+            (row['route_id'], row.get('route_short_name') or '', row.get('route_long_name') or '',
+             row.get('route_color') or '', row.get('route_text_color') or '')
+            for row in _read_rows(os.path.join(feed_dir, 'routes.txt'))
+        ))
+        connection.executemany('INSERT OR REPLACE INTO trips VALUES (?, ?, ?, ?, ?)', (
+            (row['trip_id'], row.get('route_id') or '', row.get('service_id') or '',
+             row.get('trip_headsign') or '', row.get('direction_id') or '')
+            for row in _read_rows(os.path.join(feed_dir, 'trips.txt'))
+        ))
+        connection.executemany('INSERT OR REPLACE INTO calendar VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+            (row['service_id'], *(int(row.get(day) or 0) for day in WEEKDAY_COLUMNS), row['start_date'], row['end_date'])
+            for row in _read_rows(os.path.join(feed_dir, 'calendar.txt'))
+        ))
+        connection.executemany('INSERT OR REPLACE INTO calendar_dates VALUES (?, ?, ?)', (
+            (row['service_id'], row['date'], int(row['exception_type']))
+            for row in _read_rows(os.path.join(feed_dir, 'calendar_dates.txt'))
+        ))
+
+        def stop_time_rows():
+            for row in _read_rows(os.path.join(feed_dir, 'stop_times.txt')):
+                departure_seconds = parse_gtfs_seconds(row['departure_time'])
+                if departure_seconds is None:
+                    continue
+                yield (row['stop_id'], departure_seconds, row['trip_id'], int(row.get('stop_sequence') or 0))
+
+        for batch in _batched(stop_time_rows()):
+            connection.executemany('INSERT OR IGNORE INTO stop_times VALUES (?, ?, ?, ?)', batch)
+
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('schema_version', str(SCHEMA_VERSION)),
+            ('source_mtime', repr(source_mtime(feed_dir))),
+        ])
+        connection.commit()
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(temp_path, store_path)
+    return store_path
+
+
+class GTFSStore:
+    """Read-only access to a compiled store. Each thread gets its own connection."""
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self._local = threading.local()
+        # source_mtime recorded when the store was compiled; identifies the build
+        self.source_mtime: Optional[str] = None
+
+    @classmethod
+    def open(cls, store_path: str) -> Optional['GTFSStore']:
+        """The store at store_path, or None if it is missing or was built with another schema."""
+        if not os.path.exists(store_path):
+            return None
+        store = cls(store_path)
+        try:
+            meta = dict(store._connection().execute('SELECT key, value FROM meta'))
+        except sqlite3.Error as e:
+            print(f"Error opening GTFS store {store_path}: {e}")
+            return None
+        version = meta.get('schema_version')
+        if version != str(SCHEMA_VERSION):
+            print(f"Ignoring GTFS store {store_path}: built with schema {version or '?'}")
+            return None
+        store.source_mtime = meta.get('source_mtime')
+        return store
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.store_path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def stop_departures(self, stop_id: str, after_seconds: int, until_seconds: int) -> List[Tuple]:
+        """
+        (trip_id, departure_seconds, route_id, service_id, trip_headsign, direction_id) for departures
+        at stop_id with after_seconds < departure_seconds <= until_seconds, in time order.
+        """
+        return self._connection().execute(
+            """
+            SELECT st.trip_id, st.departure_seconds, t.route_id, t.service_id, t.trip_headsign, t.direction_id
+            FROM stop_times st JOIN trips t ON t.trip_id = st.trip_id
+            WHERE st.stop_id = ? AND st.departure_seconds > ? AND st.departure_seconds <= ?
+            ORDER BY st.departure_seconds
+            """,
+            (stop_id, after_seconds, until_seconds)
+        ).fetchall()
+
+    def load_routes(self) -> CompactTable:
+        """Routes keyed by route_id, in the same shape GTFSScheduler loads from routes.txt."""
+        rows = self._connection().execute(f"SELECT route_id, {', '.join(ROUTE_COLUMNS)} FROM routes")
+        return CompactTable(ROUTE_COLUMNS, ((row[0], row[1:]) for row in rows))
+
+    def load_calendar(self) -> Dict:
+        """{service_id: (weekday flags Monday..Sunday, start_date, end_date)}, as GTFSScheduler loads from calendar.txt."""
+        return {
+            row[0]: (tuple(bool(flag) for flag in row[1:8]), row[8], row[9])
+            for row in self._connection().execute('SELECT * FROM calendar')
+        }
+
+    def load_calendar_dates(self) -> Dict:
+        """{service_id: {date: exception_type}}, as GTFSScheduler loads from calendar_dates.txt."""
+        calendar_dates = {}
+        for service_id, date_str, exception_type in self._connection().execute('SELECT * FROM calendar_dates'):
+            calendar_dates.setdefault(service_id, {})[date_str] = exception_type
+        return calendar_dates
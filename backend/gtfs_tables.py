@@ -0,0 +1,105 @@
+"""
+Compact GTFS Lookup Tables
+
+Trip and route lookups for GTFSScheduler, stored column-wise instead of as a
+dict per row. Keys are kept in one sorted, UTF-8 encoded blob and found by
+bisection, and column values (route_id, service_id, headsign, ...) are
+interned into a single value list referenced by array-backed codes. A feed's
+trips cost a few bytes per row plus each distinct string once, instead of a
+dict and its strings per trip.
+
+Lookups build a fresh dict in the same shape the scheduler cached before, so
+callers use `table.get(key)` / `table[key]` exactly as with the old dicts.
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+TRIP_COLUMNS = ('route_id', 'service_id', 'trip_headsign', 'direction_id')
+ROUTE_COLUMNS = ('route_short_name', 'route_long_name', 'route_color', 'route_text_color')
+
+
+class CompactTable:
+    """
+    Read-only {key: {column: value}} mapping built from (key, values) rows.
+    As with a dict, a later row with the same key replaces an earlier one.
+    """
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Tuple[str, Sequence[Optional[str]]]] = ()):
+        self.columns = tuple(columns)
+        width = len(self.columns)
+
+        values: List[Optional[str]] = []
+        value_codes: Dict[Optional[str], int] = {}
+        keys: List[bytes] = []
+        codes = array('I')
+
+        for key, row in rows:
+            keys.append(key.encode('utf-8'))
+            for value in row:
+                code = value_codes.get(value)
+                if code is None:
+                    code = value_codes[value] = len(values)
+                    values.append(value)
+                codes.append(code)
+
+        # Stable sort by key; of each run of equal keys, keep the last row
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        kept = [
+            index for position, index in enumerate(order)
+            if position + 1 == len(order) or keys[order[position + 1]] != keys[index]
+        ]
+
+        offsets = array('I', [0])
+        row_codes = array('I')
+        for index in kept:
+            offsets.append(offsets[-1] + len(keys[index]))
+            row_codes.extend(codes[index * width:(index + 1) * width])
+
+        self._key_blob = b''.join(keys[index] for index in kept)
+        self._key_offsets = offsets
+        self._codes = row_codes
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._key_offsets) - 1
+
+    def _key(self, index: int) -> bytes:
+        return self._key_blob[self._key_offsets[index]:self._key_offsets[index + 1]]
+
+    def _find(self, key: str) -> int:
+        """Row index for key, or -1."""
+        target = key.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._key(low) == target:
+            return low
+        return -1
+
+    def _record(self, index: int) -> Dict:
+        width = len(self.columns)
+        values = self._values
+        row = self._codes[index * width:(index + 1) * width]
+        return {column: values[code] for column, code in zip(self.columns, row)}
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> Dict:
+        index = self._find(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._record(index)
+
+    def get(self, key: str, default=None):
+        index = self._find(key)
+        return self._record(index) if index >= 0 else default
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self._key(index).decode('utf-8')
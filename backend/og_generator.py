@@ -5,14 +5,30 @@ Generates dynamic OpenGraph images for station pages that match the Figma design
 Creates images with station names overlaid on a departure board template.
 """
 
+import hashlib
 import io
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
-from typing import Optional
+from typing import Dict, Optional
+
+# Bump whenever the rendered layout changes so cached images are not reused
+TEMPLATE_VERSION = 1
+
+# Station shown on the homepage image
+DEFAULT_STATION_NAME = "University of Waterloo"
+
+
+def image_filename(station_name: str) -> str:
+    """Content-addressed file name for a station's image under the current template."""
+    digest = hashlib.sha256(f"{TEMPLATE_VERSION}:{station_name}".encode('utf-8')).hexdigest()
+    return f"{digest}.png"
 
 
 class OGImageGenerator:
-    def __init__(self):
+    def __init__(self, cache_size: int = 256, cache_dir: Optional[str] = None,
+                 prerendered_dir: Optional[str] = None):
         # OpenGraph image dimensions (1200x630 is the standard)
         self.OG_WIDTH = 1200
         self.OG_HEIGHT = 630
@@ -28,9 +44,30 @@ class OGImageGenerator:
         self.TITLE_FONT_SIZE = 72
         self.SUBTITLE_FONT_SIZE = 36
         self.SMALL_FONT_SIZE = 24
-        
+
+        # Rendered PNG bytes keyed by (TEMPLATE_VERSION, station name), least recently used first.
+        # cache_dir adds an on-disk tier that survives restarts. prerendered_dir holds
+        # images written ahead of time by scripts/prerender_og_images.py (read-only).
+        # Only images the caller marks persistent (known stations) are written to cache_dir,
+        # so arbitrary names cannot grow it.
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.prerendered_dir = prerendered_dir
+        self._images: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Fonts by size and the logo resized to each requested size, loaded on first use
+        self._fonts: Dict[int, ImageFont.FreeTypeFont] = {}
+        self._logos: Dict[int, Optional[Image.Image]] = {}
+
     def _get_font(self, size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
-        """Get Overpass font with the specified size. Falls back to default if not available."""
+        """Get Overpass font with the specified size (cached). Falls back to default if not available."""
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = self._load_font(size)
+        return font
+
+    def _load_font(self, size: int) -> ImageFont.FreeTypeFont:
         try:
             # Use Overpass font from backend resources
             font_path = os.path.join(os.path.dirname(__file__), 'resources', 'overpass-bold.otf')
@@ -44,6 +81,31 @@ class OGImageGenerator:
         except Exception:
             return ImageFont.load_default()
     
+    def _get_logo(self, size: int) -> Optional[Image.Image]:
+        """The T logo resized to size x size as RGBA (cached), or None if it can't be loaded."""
+        if size in self._logos:
+            return self._logos[size]
+
+        logo_img = None
+        try:
+            logo_path = os.path.join(os.path.dirname(__file__), 'resources', 'T logo.png')
+            if os.path.exists(logo_path):
+                with Image.open(logo_path) as source:
+                    # Resize logo to fit the desired size while maintaining aspect ratio
+                    logo_img = source.resize((size, size), Image.Resampling.LANCZOS)
+
+                # Convert to RGBA if not already (for transparency support)
+                if logo_img.mode != 'RGBA':
+                    logo_img = logo_img.convert('RGBA')
+            else:
+                print(f"Logo file not found: {logo_path}")
+
+        except Exception as e:
+            print(f"Error loading logo: {e}")
+
+        self._logos[size] = logo_img
+        return logo_img
+
     def _wrap_text(self, text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
         """Wrap text to fit within max_width."""
         words = text.split()
@@ -68,16 +130,77 @@ class OGImageGenerator:
             
         return lines
     
-    def generate_station_image(self, station_name: str) -> bytes:
+    def _disk_path(self, key: tuple) -> str:
+        return os.path.join(self.cache_dir, image_filename(key[1]))
+
+    def prerendered_path(self, station_name: str) -> Optional[str]:
+        """Path of the pre-rendered image for station_name, if one exists."""
+        if not self.prerendered_dir:
+            return None
+        path = os.path.abspath(os.path.join(self.prerendered_dir, image_filename(station_name)))
+        return path if os.path.isfile(path) else None
+
+    def _read_disk(self, key: tuple) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: tuple, image_bytes: bytes):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing OG image cache: {e}")
+
+    def _remember(self, key: tuple, image_bytes: bytes):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._images[key] = image_bytes
+            self._images.move_to_end(key)
+            while len(self._images) > self.cache_size:
+                self._images.popitem(last=False)
+
+    def generate_station_image(self, station_name: str, persist: bool = True) -> bytes:
         """
         Generate an OpenGraph image for a specific station matching the Figma design.
+        Rendered images are cached in memory (and on disk when cache_dir is set).
         
         Args:
             station_name: Name of the station to display
+            persist: Whether a fresh render may be written to cache_dir
             
         Returns:
             PNG image bytes
         """
+        key = (TEMPLATE_VERSION, station_name)
+        with self._lock:
+            image_bytes = self._images.get(key)
+            if image_bytes is not None:
+                self._images.move_to_end(key)
+                return image_bytes
+
+        image_bytes = self._read_disk(key)
+        if image_bytes is None:
+            image_bytes = self.render_station_image(station_name)
+            if persist:
+                self._write_disk(key, image_bytes)
+
+        self._remember(key, image_bytes)
+        return image_bytes
+
+    def render_station_image(self, station_name: str) -> bytes:
+        """Draw and PNG-encode the station image, bypassing the caches."""
         # Create image with black background
         img = Image.new('RGB', (self.OG_WIDTH, self.OG_HEIGHT), self.BLACK)
         draw = ImageDraw.Draw(img)
@@ -100,30 +223,9 @@ class OGImageGenerator:
         logo_x = left_margin
         logo_y = 80  # Top margin
         
-        try:
-            logo_path = os.path.join(os.path.dirname(__file__), 'resources', 'T logo.png')
-            print(f"Looking for logo at: {logo_path}")  # Debug log
-            print(f"Logo exists: {os.path.exists(logo_path)}")  # Debug log
-            
-            if os.path.exists(logo_path):
-                logo_img = Image.open(logo_path)
-                print(f"Loaded logo: {logo_img.size}, mode: {logo_img.mode}")  # Debug log
-                
-                # Resize logo to fit the desired size while maintaining aspect ratio
-                logo_img = logo_img.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-                
-                # Convert to RGBA if not already (for transparency support)
-                if logo_img.mode != 'RGBA':
-                    logo_img = logo_img.convert('RGBA')
-                
-                # Paste the logo onto the main image
-                img.paste(logo_img, (logo_x, logo_y), logo_img)
-                print("Logo pasted successfully")  # Debug log
-            else:
-                print("Logo file not found!")  # Debug log
-                
-        except Exception as e:
-            print(f"Error loading logo: {e}")  # Debug log
+        logo_img = self._get_logo(logo_size)
+        if logo_img is not None:
+            img.paste(logo_img, (logo_x, logo_y), logo_img)
         
         # Draw station name below the logo, left-aligned
         max_station_width = self.OG_WIDTH - (left_margin * 2)  # Full width minus margins
@@ -155,4 +257,4 @@ class OGImageGenerator:
     
     def generate_default_image(self) -> bytes:
         """Generate a default OpenGraph image for the homepage."""
-        return self.generate_station_image("University of Waterloo")
\ No newline at end of file
+        return self.generate_station_image(DEFAULT_STATION_NAME)
\ No newline at end of file
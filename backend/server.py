@@ -1,13 +1,15 @@
-import json
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 from functools import wraps
-from difflib import SequenceMatcher
-from transit_plugins import PluginManager
-# from gtfs_scheduler import GTFSScheduler  # Disabled due to duplication issues
-from og_generator import OGImageGenerator
+from transit_plugins import PluginManager, DeparturePoller
+from gtfs_scheduler import GTFSScheduler
+from og_generator import OGImageGenerator, DEFAULT_STATION_NAME
+from station_registry import StationRegistry
+from station_search import StationSearch
+from station_payload import StationPayloads, VIEWS as STATION_PAYLOAD_VIEWS
+from departure_stream import DepartureStream
 
 
 # get the environment variables
@@ -17,15 +19,85 @@ GO_API_KEY = os.environ.get('GO_API_KEY')
 
 # Initialize plugin manager and OG image generator
 plugin_config = {
-    'GO_API_KEY': GO_API_KEY
+    'GO_API_KEY': GO_API_KEY,
+    'REQUEST_DEADLINE': os.environ.get('REQUEST_DEADLINE'),
+    'MAX_UPSTREAM_WORKERS': os.environ.get('MAX_UPSTREAM_WORKERS'),
+    'HTTP_CONNECT_TIMEOUT': os.environ.get('HTTP_CONNECT_TIMEOUT'),
+    'HTTP_READ_TIMEOUT': os.environ.get('HTTP_READ_TIMEOUT'),
+    'HTTP_MAX_RETRIES': os.environ.get('HTTP_MAX_RETRIES'),
+    'HTTP_BACKOFF_FACTOR': os.environ.get('HTTP_BACKOFF_FACTOR'),
+    'HTTP_POOL_MAXSIZE': os.environ.get('HTTP_POOL_MAXSIZE'),
+    'DEPARTURE_CACHE_TTL': os.environ.get('DEPARTURE_CACHE_TTL'),
+    'CIRCUIT_FAILURE_THRESHOLD': os.environ.get('CIRCUIT_FAILURE_THRESHOLD'),
+    'CIRCUIT_COOL_DOWN': os.environ.get('CIRCUIT_COOL_DOWN'),
+    # GTFS-Realtime TripUpdates feeds, used instead of a network's own API when set
+    'GO_TRIP_UPDATES_URL': os.environ.get('GO_TRIP_UPDATES_URL'),
+    'GRT_TRIP_UPDATES_URL': os.environ.get('GRT_TRIP_UPDATES_URL'),
+    # Substituted for '{api_key}' in the matching feed URL
+    'GO_TRIP_UPDATES_KEY': os.environ.get('GO_TRIP_UPDATES_KEY'),
+    'GRT_TRIP_UPDATES_KEY': os.environ.get('GRT_TRIP_UPDATES_KEY'),
+    'TRIP_UPDATES_TTL': os.environ.get('TRIP_UPDATES_TTL'),
+    # Seconds concurrent GRT requests are collected into one GraphQL query (0 disables)
+    'GRT_BATCH_WINDOW': os.environ.get('GRT_BATCH_WINDOW')
 }
-plugin_manager = PluginManager(plugin_config)
-# gtfs_scheduler = GTFSScheduler()  # Disabled due to duplication issues
-og_generator = OGImageGenerator()
+# Optional static GTFS schedules (STATIC_SCHEDULES=1) fill in departures beyond the
+# realtime feeds and stand in for a network whose feed is down. Only networks with a
+# store compiled by scripts/compile_gtfs.py are looked up.
+# Trip and route names for GTFS-Realtime feeds come from the same tables either way.
+static_gtfs = GTFSScheduler()
+gtfs_scheduler = None
+if os.environ.get('STATIC_SCHEDULES', '').lower() in ('1', 'true', 'yes'):
+    gtfs_scheduler = static_gtfs
+plugin_manager = PluginManager(plugin_config, scheduler=gtfs_scheduler, static_gtfs=static_gtfs)
+
+# Optional background refresh of frequently requested stops
+departure_poller = None
+if os.environ.get('DEPARTURE_POLLER', '').lower() in ('1', 'true', 'yes'):
+    # e.g. POLLER_RATE_BUDGETS=GO:120,GRT:60 (upstream calls per minute)
+    rate_budgets = {}
+    for budget in os.environ.get('POLLER_RATE_BUDGETS', '').split(','):
+        if ':' in budget:
+            network, calls_per_minute = budget.split(':', 1)
+            rate_budgets[network.strip()] = float(calls_per_minute)
+
+    departure_poller = DeparturePoller(
+        plugin_manager,
+        interval=float(os.environ.get('POLLER_INTERVAL', 10)),
+        idle_timeout=float(os.environ.get('POLLER_IDLE_TIMEOUT', 600)),
+        pinned_stops=[stop.strip() for stop in os.environ.get('POLLER_PINNED_STOPS', '').split(',') if stop.strip()],
+        rate_budgets=rate_budgets
+    )
+    departure_poller.start()
+og_generator = OGImageGenerator(
+    cache_size=int(os.environ.get('OG_CACHE_SIZE', 256)),
+    cache_dir=os.environ.get('OG_CACHE_DIR') or None,
+    prerendered_dir=os.environ.get('OG_PRERENDERED_DIR', 'static/og_images')
+)
+station_registry = StationRegistry('static/consolidated_stations.json')
+station_search = StationSearch(station_registry)
+station_payloads = StationPayloads(station_registry)
+
+# Boards subscribed to /api/departures/stream (served by asgi.py) share one
+# refresh per stop set
+STREAM_KEEPALIVE = float(os.environ.get('STREAM_KEEPALIVE', 20))
+
+def build_stream_board(stop_ids):
+    """Board for a streamed stop set; each refresh keeps its stops hot for the poller"""
+    if departure_poller:
+        departure_poller.record_request(stop_ids)
+    return build_departure_board(stop_ids)[0]
+
+departure_stream = DepartureStream(
+    build_stream_board,
+    interval=float(os.environ.get('STREAM_INTERVAL', 15))
+)
+
+# Most boards one /api/departures/batch call may ask for
+MAX_BATCH_BOARDS = int(os.environ.get('MAX_BATCH_BOARDS', 50))
 
 # app instance
 app = Flask(__name__)
-CORS(app, methods=["GET"], allow_headers=["X-API-Key", "Content-Type"])
+CORS(app, methods=["GET", "POST"], allow_headers=["X-API-Key", "Content-Type"], expose_headers=["X-Partial-Networks", "X-Scheduled-Networks"])
 
 def requires_api_key(f):
     @wraps(f)
@@ -45,14 +117,29 @@ def requires_api_key(f):
 def test_endpoint():
     return jsonify({'message': 'This should be protected'})
 
-# api/departures
-@app.route('/api/departures', methods=['GET'])
-@requires_api_key
-def get_departures():
-    # Accept stops parameter (primary) or station ID (legacy support)
-    stops_param = request.args.get('stops', '')
-    station_param = request.args.get('station', '')
+def departure_to_dict(departure):
+    """API shape of a plugin Departure, plus the fields merge_departures matches on"""
+    return {
+        'stopId': departure.stop_id,
+        'routeNumber': departure.route_number,
+        'headsign': departure.headsign,
+        'platform': departure.platform,
+        'routeNetwork': departure.route_network,
+        'time': departure.time,
+        'countdown': departure.countdown,
+        'branchCode': departure.branch_code,
+        'routeColor': departure.route_color,
+        'routeTextColor': departure.route_text_color,
+        'departureTimestamp': departure.departure_timestamp,
+        'tripId': departure.trip_id,
+        'isScheduled': departure.is_scheduled
+    }
 
+def stop_ids_from_params(stops_param, station_param):
+    """
+    Stop IDs from the stops (primary) or station (legacy) query parameter.
+    Returns (stop_ids, None), or (None, (error body, status)) for a bad request.
+    """
     stop_ids = []
 
     if stops_param:
@@ -60,42 +147,55 @@ def get_departures():
         stop_ids = [stop.strip() for stop in stops_param.split(',') if stop.strip()]
     elif station_param:
         # Legacy support: station ID lookup
-        stations = load_consolidated_stations()
-        station = next((s for s in stations if s['station_id'] == station_param), None)
+        station = station_registry.get_station(station_param)
 
         if not station:
-            return jsonify({'error': f'Station not found: {station_param}'}), 404
+            return None, ({'error': f'Station not found: {station_param}'}, 404)
 
         # Extract all stop IDs from the station
         stop_ids = [stop['stop_id'] for stop in station['stops'] if stop.get('stop_id')]
 
         if not stop_ids:
-            return jsonify({'error': f'No valid stops found for station: {station_param}'}), 400
+            return None, ({'error': f'No valid stops found for station: {station_param}'}, 400)
     else:
-        return jsonify({'error': 'stops parameter is required (e.g., ?stops=GRT_1078,GO_02799)'}), 400
-    
+        return None, ({'error': 'stops parameter is required (e.g., ?stops=GRT_1078,GO_02799)'}, 400)
+
+    return stop_ids, None
+
+def requested_stop_ids():
+    """stop_ids_from_params for the current request, with errors as JSON responses"""
+    # Accept stops parameter (primary) or station ID (legacy support)
+    stop_ids, error = stop_ids_from_params(request.args.get('stops', ''), request.args.get('station', ''))
+    if error:
+        body, status = error
+        return None, (jsonify(body), status)
+    return stop_ids, None
+
+def build_departure_board(stop_ids):
+    """Departures for stop_ids grouped by network and route, plus the DepartureResult behind them"""
     # Use plugin manager to get departures
-    departures_list = plugin_manager.get_departures_for_stops(stop_ids)
-    
-    # TODO: Re-enable GTFS scheduler integration once duplication issues are fixed
-    # static_departures_list = gtfs_scheduler.get_static_departures(stop_ids)
-    # all_departures = gtfs_scheduler.merge_departures(realtime_departures_dicts, static_departures_list)
+    departures_result = plugin_manager.fetch_departures(stop_ids)
+    return group_departures(stop_ids, departures_result), departures_result
+
+def group_departures(stop_ids, departures_result):
+    """Merge in scheduled departures and group everything by network and route"""
+    departures_list = departures_result.departures
     
     # Convert plugin Departure objects to dictionaries for compatibility
-    departures_dicts = []
-    for departure in departures_list:
-        departures_dicts.append({
-            'stopId': departure.stop_id,
-            'routeNumber': departure.route_number,
-            'headsign': departure.headsign,
-            'platform': departure.platform,
-            'routeNetwork': departure.route_network,
-            'time': departure.time,
-            'countdown': departure.countdown,
-            'branchCode': departure.branch_code,
-            'routeColor': departure.route_color,
-            'routeTextColor': departure.route_text_color
-        })
+    departures_dicts = [departure_to_dict(departure) for departure in departures_list]
+
+    if gtfs_scheduler:
+        # Scheduled departures the realtime feeds don't cover (duplicates are merged away).
+        # Stops the fallback already answered from the schedule aren't looked up again.
+        already_scheduled = set(departures_result.scheduled_stop_ids)
+        static_departures = [
+            departure_to_dict(departure)
+            for network, network_stop_ids in plugin_manager.group_stops_by_network(
+                [stop_id for stop_id in stop_ids if stop_id not in already_scheduled]
+            ).items()
+            for departure in plugin_manager.get_scheduled_departures(network, network_stop_ids)
+        ]
+        departures_dicts = gtfs_scheduler.merge_departures(departures_dicts, static_departures)
 
     # Group by network (existing grouping logic)
     network_groups = {}
@@ -126,7 +226,8 @@ def get_departures():
         time = "Now" if departure['countdown'] <= 1 else departure['time']
         network_groups[network]['routes'][route_key]['departures'].append({
             'time': time,
-            'countdown': departure['countdown']
+            'countdown': departure['countdown'],
+            'isScheduled': departure['isScheduled']
         })
 
     # Sort departures within each route group by countdown
@@ -153,48 +254,105 @@ def get_departures():
     # Sort networks alphabetically
     result.sort(key=lambda x: x['network'])
 
-    return jsonify(result)
+    return result
 
-def load_consolidated_stations():
-    """Load the consolidated stations from JSON file."""
-    try:
-        with open('static/consolidated_stations.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return []
-
-def station_name_similarity(query: str, station_name: str, stop_count: int = 1) -> float:
-    """Calculate similarity between search query and station name."""
-    query_lower = query.lower().strip()
-    station_lower = station_name.lower().strip()
-    is_major_hub = stop_count >= 2
-    
-    # Exact match
-    if query_lower == station_lower:
-        return 1.0
-    
-    # Check if query matches the start of station name (high priority)
-    if station_lower.startswith(query_lower):
-        # Major hubs get extra priority when query matches beginning
-        if is_major_hub:
-            return 0.98  # Higher than regular prefix match
-        return 0.95
-    
-    # Check if query is contained in station name
-    if query_lower in station_lower:
-        return 0.9
-    
-    # Check if any word in station name starts with query
-    station_words = station_lower.split()
-    for word in station_words:
-        if word.startswith(query_lower):
-            # Major hubs get boost for word prefix matches too
-            if is_major_hub:
-                return 0.88
-            return 0.85
-    
-    # Fuzzy matching
-    return SequenceMatcher(None, query_lower, station_lower).ratio()
+# api/departures
+@app.route('/api/departures', methods=['GET'])
+@requires_api_key
+def get_departures():
+    stop_ids, error = requested_stop_ids()
+    if error:
+        return error
+
+    if departure_poller:
+        departure_poller.record_request(stop_ids)
+
+    result, departures_result = build_departure_board(stop_ids)
+
+    response = jsonify(result)
+    # Flag networks that errored or missed the deadline without changing the payload shape
+    if departures_result.partial:
+        response.headers['X-Partial-Networks'] = ','.join(departures_result.incomplete_networks)
+    if departures_result.scheduled_networks:
+        response.headers['X-Scheduled-Networks'] = ','.join(departures_result.scheduled_networks)
+    return response
+
+# api/departures/batch
+@app.route('/api/departures/batch', methods=['POST'])
+@requires_api_key
+def get_departures_batch():
+    """
+    Departures for several boards in one call, e.g.
+    {"boards": {"lobby": {"stops": "GRT_1078,GO_02799"}, "concourse": {"station": "..."}}}
+    ("stops" may also be a list). The union of every board's stops is fetched once,
+    so each network gets one round of upstream calls for the whole batch.
+
+    Returns {"boards": {key: {"departures": [...], "partialNetworks": [...],
+    "scheduledNetworks": [...]}}}, where departures are grouped as in /api/departures.
+    A board with bad parameters gets {"error": ..., "status": ...} instead.
+    """
+    payload = request.get_json(silent=True)
+    boards = payload.get('boards') if isinstance(payload, dict) else None
+    if not isinstance(boards, dict) or not boards:
+        return jsonify({'error': 'boards object is required (e.g., {"boards": {"lobby": {"stops": "GRT_1078,GO_02799"}}})'}), 400
+    if len(boards) > MAX_BATCH_BOARDS:
+        return jsonify({'error': f'At most {MAX_BATCH_BOARDS} boards per batch'}), 400
+
+    results = {}
+    board_stops = {}
+    for key, board in boards.items():
+        if not isinstance(board, dict):
+            results[key] = {'error': 'Board must be an object with stops or station', 'status': 400}
+            continue
+        stops = board.get('stops') or ''
+        if isinstance(stops, list):
+            stops = ','.join(str(stop) for stop in stops)
+        stop_ids, error = stop_ids_from_params(str(stops), str(board.get('station') or ''))
+        if error:
+            body, status = error
+            results[key] = {**body, 'status': status}
+        else:
+            board_stops[key] = stop_ids
+
+    # Boards on a wall share stations, so fetch each stop once for the whole batch
+    all_stop_ids = list(dict.fromkeys(stop_id for stop_ids in board_stops.values() for stop_id in stop_ids))
+    if all_stop_ids:
+        if departure_poller:
+            departure_poller.record_request(all_stop_ids)
+        departures_result = plugin_manager.fetch_departures(all_stop_ids)
+
+        for key, stop_ids in board_stops.items():
+            board_result = departures_result.for_stops(stop_ids)
+            results[key] = {
+                'departures': group_departures(stop_ids, board_result),
+                'partialNetworks': board_result.incomplete_networks,
+                'scheduledNetworks': board_result.scheduled_networks
+            }
+
+    return jsonify({'boards': results})
+
+@app.route('/api/poller-status', methods=['GET'])
+@requires_api_key
+def get_poller_status():
+    """Report how fresh the background-refreshed departures are for each hot stop."""
+    if not departure_poller:
+        return jsonify({'enabled': False, 'stops': []})
+    return jsonify({
+        'enabled': True,
+        'interval': departure_poller.interval,
+        'stops': departure_poller.status()
+    })
+
+@app.route('/api/health', methods=['GET'])
+@requires_api_key
+def get_health():
+    """Per-network circuit state, recent error rate and upstream latency."""
+    networks = plugin_manager.health()
+    return jsonify({
+        'healthy': all(network['state'] == 'closed' for network in networks.values()),
+        'networks': networks,
+        'streams': departure_stream.status()
+    })
 
 @app.route('/api/stations/search', methods=['GET'])
 @requires_api_key
@@ -217,83 +375,8 @@ def search_stations():
     
     limit = int(request.args.get('limit', 10))
     
-    # Load consolidated stations
-    stations = load_consolidated_stations()
-    
-    # Filter and score stations
-    scored_stations = []
-    for station in stations:
-        # Filter by agencies if specified
-        if wanted_agencies:
-            station_agencies = set(stop['agency'] for stop in station['stops'])
-            if not station_agencies.intersection(wanted_agencies):
-                continue
-        
-        # Filter stops by agencies if specified
-        filtered_stops = station['stops']
-        if wanted_agencies:
-            filtered_stops = [stop for stop in station['stops'] if stop['agency'] in wanted_agencies]
-        
-        # Calculate similarity score with stop count for major hub prioritization
-        score = station_name_similarity(query, station['station_name'], len(filtered_stops))
-        
-        # Skip if score is too low
-        if score < 0.3:
-            continue
-        
-        # Add a small bonus for stations with more stops (major hubs)
-        stop_count_bonus = min(len(filtered_stops) * 0.05, 0.2)  # Max 0.2 bonus
-        
-        # Give priority to GO Transit stations (regional transit)
-        go_bonus = 0.0
-        station_agencies = set(stop['agency'] for stop in filtered_stops)
-        if 'GO' in station_agencies:
-            go_bonus = 0.25  # Significant boost for GO stations
-        
-        # Check if user mentioned specific agency in search query (as standalone words)
-        agency_query_bonus = 0.0
-        query_words = set(query.lower().split())
-        
-        # Map agency mentions to actual agency codes (exact word matches only)
-        agency_mentions = {
-            'go': 'GO',
-            'grt': 'GRT',
-            'ion': 'GRT'  # ION is part of GRT
-        }
-        
-        # Check for multi-word agency names
-        query_lower = query.lower()
-        if 'go transit' in query_lower and 'GO' in station_agencies:
-            agency_query_bonus = 0.3
-        elif 'grand river transit' in query_lower and 'GRT' in station_agencies:
-            agency_query_bonus = 0.3
-        elif 'grand river' in query_lower and 'GRT' in station_agencies:
-            agency_query_bonus = 0.3
-        else:
-            # Check single word mentions
-            for mention, agency_code in agency_mentions.items():
-                if mention in query_words and agency_code in station_agencies:
-                    agency_query_bonus = 0.3  # Higher than GO bonus to respect user intent
-                    break
-        
-        final_score = score + stop_count_bonus + go_bonus + agency_query_bonus
-        
-        scored_stations.append({
-            'station_id': station['station_id'],
-            'station_name': station['station_name'], 
-            'station_lat': station['station_lat'],
-            'station_lon': station['station_lon'],
-            'stops': filtered_stops,
-            'score': final_score
-        })
-    
-    # Sort by score (descending) and limit results
-    scored_stations.sort(key=lambda x: x['score'], reverse=True)
-    results = scored_stations[:limit]
-    
-    # Remove score from final results
-    for result in results:
-        del result['score']
+    # Only stations that can still make the top results are scored
+    results = station_search.search(query, wanted_agencies, limit)
     
     return jsonify({
         'query': query,
@@ -307,9 +390,34 @@ def get_consolidated_stations():
     """
     Return all consolidated stations for client-side lookup.
     This is useful for reverse-searching station names from stop IDs.
+    Query params:
+    - view: 'full' (default) or 'slim' (station_id, name, lat/lon and stop_ids only)
+
+    The body is serialized once per load of the stations file and served
+    pre-compressed, with a strong ETag for If-None-Match revalidation.
     """
-    stations = load_consolidated_stations()
-    return jsonify(stations)
+    view = request.args.get('view', 'full')
+    if view not in STATION_PAYLOAD_VIEWS:
+        return jsonify({'error': f"Invalid view: {view} (expected one of {', '.join(STATION_PAYLOAD_VIEWS)})"}), 400
+
+    payload = station_payloads.get(view)
+    headers = {
+        'Cache-Control': 'no-cache',  # Clients revalidate with the ETag
+        'Vary': 'Accept-Encoding'
+    }
+
+    if request.if_none_match.contains_weak(payload.etag):
+        response = app.response_class(status=304, headers=headers)
+        response.set_etag(payload.etag)
+        return response
+
+    encoding, body = payload.choose(request.accept_encodings)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    response = app.response_class(body, mimetype='application/json', headers=headers)
+    response.set_etag(payload.etag)
+    return response
 
 @app.route('/api/og-image', methods=['GET'])
 def generate_og_image():
@@ -328,27 +436,31 @@ def generate_og_image():
     if stops_param and not station_name:
         stop_ids = [stop.strip() for stop in stops_param.split(',') if stop.strip()]
         if stop_ids:
-            stations = load_consolidated_stations()
             # Find station that contains these stops
-            for station in stations:
-                station_stop_ids = [stop['stop_id'] for stop in station['stops']]
-                if all(stop_id in station_stop_ids for stop_id in stop_ids):
-                    station_name = station['station_name']
-                    break
+            station = station_registry.find_station_with_stops(stop_ids)
+            if station:
+                station_name = station['station_name']
 
     # Legacy: If station ID provided, look up the station name
     elif station_id and not station_name:
-        stations = load_consolidated_stations()
-        station = next((s for s in stations if s['station_id'] == station_id), None)
+        station = station_registry.get_station(station_id)
         if station:
             station_name = station['station_name']
         else:
             return jsonify({'error': f'Station not found: {station_id}'}), 404
 
+    # Serve the pre-rendered file when scripts/prerender_og_images.py has produced one
+    prerendered_path = og_generator.prerendered_path(station_name or DEFAULT_STATION_NAME)
+    if prerendered_path:
+        return send_file(prerendered_path, mimetype='image/png', max_age=3600)  # Cache for 1 hour
+
     # Generate image
     try:
         if station_name:
-            image_bytes = og_generator.generate_station_image(station_name)
+            # Only known stations (what prerender_og_images.py renders) go to the disk cache
+            image_bytes = og_generator.generate_station_image(
+                station_name, persist=station_registry.has_station_name(station_name)
+            )
         else:
             # Default image for homepage
             image_bytes = og_generator.generate_default_image()
@@ -0,0 +1,76 @@
+"""
+Consolidated Stations Payload
+
+Serializes the consolidated stations once per load of the stations file and
+keeps the JSON bytes alongside gzip and (when the brotli package is
+installed) brotli variants and a strong ETag. /api/consolidated-stations
+serves these bytes directly instead of re-encoding the list per request.
+
+Two views are available: 'full' (the stations as stored) and 'slim'
+(station_id, name, lat/lon and stop_ids only).
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+VIEWS = ('full', 'slim')
+
+
+def slim_station(station: Dict) -> Dict:
+    """Project a station down to what's needed for stop -> station lookups."""
+    return {
+        'station_id': station['station_id'],
+        'station_name': station['station_name'],
+        'station_lat': station['station_lat'],
+        'station_lon': station['station_lon'],
+        'stop_ids': [stop['stop_id'] for stop in station['stops']]
+    }
+
+
+class StationPayload:
+    """One serialized view of the stations with its encoded variants."""
+
+    def __init__(self, data: List[Dict]):
+        # Same encoding as Flask's jsonify in production (sorted keys, compact, ASCII)
+        self.body = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.encoded = {'gzip': gzip.compress(self.body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(self.body, quality=11)
+
+    def choose(self, accept_encodings) -> tuple:
+        """(content_encoding or None, bytes) for the client's Accept-Encoding."""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and accept_encodings[encoding]:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+
+class StationPayloads:
+    """Keeps serialized station payloads in step with a StationRegistry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._stations: Optional[List[Dict]] = None
+        self._payloads: Dict[str, StationPayload] = {}
+
+    def get(self, view: str = 'full') -> StationPayload:
+        stations = self.registry.stations
+        if self._stations is not stations:
+            self._payloads = {}
+            self._stations = stations
+
+        payloads = self._payloads
+        payload = payloads.get(view)
+        if payload is None:
+            data = stations if view == 'full' else [slim_station(station) for station in stations]
+            payload = StationPayload(data)
+            payloads[view] = payload
+        return payload
@@ -0,0 +1,97 @@
+"""
+Consolidated Station Registry
+
+Loads static/consolidated_stations.json once and keeps lookup tables keyed by
+station_id and stop_id, plus the set of station names. The file is re-read only when its modification time
+changes.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class StationRegistry:
+    def __init__(self, file_path: str = 'static/consolidated_stations.json'):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._loaded = False
+
+        # (stations, by station_id, by stop_id, station names) swapped in as one unit on
+        # reload. The stop_id table maps to positions of the stations containing it, in file order.
+        self._tables = ([], {}, {}, frozenset())
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.file_path).st_mtime
+        except OSError:
+            return None
+
+    def _load(self):
+        """Read the stations file and rebuild the lookup tables."""
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                stations = json.load(f)
+        except FileNotFoundError:
+            stations = []
+
+        by_station_id = {}
+        by_stop_id = {}
+        for position, station in enumerate(stations):
+            by_station_id.setdefault(station['station_id'], station)
+            for stop in station['stops']:
+                stop_positions = by_stop_id.setdefault(stop['stop_id'], [])
+                if not stop_positions or stop_positions[-1] != position:
+                    stop_positions.append(position)
+
+        station_names = frozenset(station['station_name'] for station in stations)
+        self._tables = (stations, by_station_id, by_stop_id, station_names)
+
+    def refresh(self):
+        """Reload the stations if the file changed since it was last read."""
+        mtime = self._current_mtime()
+        if self._loaded and mtime == self._mtime:
+            return
+
+        with self._lock:
+            if not self._loaded or mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+                self._loaded = True
+
+    @property
+    def stations(self) -> List[Dict]:
+        """All consolidated stations, in file order."""
+        self.refresh()
+        return self._tables[0]
+
+    def get_station(self, station_id: str) -> Optional[Dict]:
+        """Look up a station by its station_id."""
+        self.refresh()
+        return self._tables[1].get(station_id)
+
+    def has_station_name(self, station_name: str) -> bool:
+        """Whether any station is named exactly station_name."""
+        self.refresh()
+        return station_name in self._tables[3]
+
+    def get_stations_for_stop(self, stop_id: str) -> List[Dict]:
+        """All stations that include the given prefixed stop ID (e.g. 'GRT_1078')."""
+        self.refresh()
+        stations, _, by_stop_id, _ = self._tables
+        return [stations[position] for position in by_stop_id.get(stop_id, [])]
+
+    def find_station_with_stops(self, stop_ids: List[str]) -> Optional[Dict]:
+        """First station (in file order) that contains every one of stop_ids."""
+        self.refresh()
+        if not stop_ids:
+            return None
+
+        # Only stations containing the first stop can contain all of them
+        for station in self.get_stations_for_stop(stop_ids[0]):
+            station_stop_ids = {stop['stop_id'] for stop in station['stops']}
+            if all(stop_id in station_stop_ids for stop_id in stop_ids):
+                return station
+        return None
@@ -0,0 +1,403 @@
+"""
+Station Name Search
+
+Ranks consolidated stations against a type-ahead query. StationSearchIndex
+precomputes normalized names, a sorted name/word prefix table and an n-gram
+index when the stations are loaded, so each query only runs SequenceMatcher
+against the few stations that can still make the top results.
+
+Ranking is identical to the linear scan in search_stations_linear: name
+similarity plus hub, GO and agency-mention bonuses, ties broken by file order.
+Stations sharing trigrams with the query are scored first to raise the cutoff.
+Any other station is scored only while bounds on its similarity (name length,
+shared characters, longest common subsequence) plus its bonuses can still
+place it.
+"""
+
+import heapq
+import math
+from bisect import bisect_left
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+# Stations whose name similarity is below this are never returned
+MIN_NAME_SIMILARITY = 0.3
+
+# Slack for float rounding when comparing upper bounds against scores
+SCORE_EPSILON = 1e-9
+
+# Longest n-gram kept in the substring index
+NGRAM_SIZE = 3
+
+# Stations sharing at least this fraction of the query's trigrams are scored first
+FUZZY_MIN_SHARED_NGRAMS = 0.25
+
+# Map agency mentions to actual agency codes (exact word matches only)
+AGENCY_MENTIONS = {
+    'go': 'GO',
+    'grt': 'GRT',
+    'ion': 'GRT'  # ION is part of GRT
+}
+
+
+def station_name_similarity(query: str, station_name: str, stop_count: int = 1) -> float:
+    """Calculate similarity between search query and station name."""
+    query_lower = query.lower().strip()
+    station_lower = station_name.lower().strip()
+    is_major_hub = stop_count >= 2
+
+    # Exact match
+    if query_lower == station_lower:
+        return 1.0
+
+    # Check if query matches the start of station name (high priority)
+    if station_lower.startswith(query_lower):
+        # Major hubs get extra priority when query matches beginning
+        if is_major_hub:
+            return 0.98  # Higher than regular prefix match
+        return 0.95
+
+    # Check if query is contained in station name
+    if query_lower in station_lower:
+        return 0.9
+
+    # Check if any word in station name starts with query
+    station_words = station_lower.split()
+    for word in station_words:
+        if word.startswith(query_lower):
+            # Major hubs get boost for word prefix matches too
+            if is_major_hub:
+                return 0.88
+            return 0.85
+
+    # Fuzzy matching
+    return SequenceMatcher(None, query_lower, station_lower).ratio()
+
+
+def agency_query_bonus(query: str, station_agencies: Set[str]) -> float:
+    """Bonus when the user mentioned one of the station's agencies in the query."""
+    query_words = set(query.lower().split())
+
+    # Check for multi-word agency names
+    query_lower = query.lower()
+    if 'go transit' in query_lower and 'GO' in station_agencies:
+        return 0.3
+    elif 'grand river transit' in query_lower and 'GRT' in station_agencies:
+        return 0.3
+    elif 'grand river' in query_lower and 'GRT' in station_agencies:
+        return 0.3
+
+    # Check single word mentions
+    for mention, agency_code in AGENCY_MENTIONS.items():
+        if mention in query_words and agency_code in station_agencies:
+            return 0.3  # Higher than GO bonus to respect user intent
+    return 0.0
+
+
+def station_bonuses(query: str, filtered_stop_count: int, station_agencies: Set[str]) -> tuple:
+    """(stop_count_bonus, go_bonus, agency_query_bonus) for a station."""
+    # Add a small bonus for stations with more stops (major hubs)
+    stop_count_bonus = min(filtered_stop_count * 0.05, 0.2)  # Max 0.2 bonus
+
+    # Give priority to GO Transit stations (regional transit)
+    go_bonus = 0.25 if 'GO' in station_agencies else 0.0  # Significant boost for GO stations
+
+    return stop_count_bonus, go_bonus, agency_query_bonus(query, station_agencies)
+
+
+def _lcs_length(query_masks: Dict[str, int], query_length: int, text: str) -> int:
+    """
+    Longest common subsequence of the query and text, bit-parallel over the query's
+    positions (query_masks maps each character to the bits where it occurs).
+    SequenceMatcher's matching blocks form a common subsequence, so this bounds them.
+    """
+    all_bits = (1 << query_length) - 1
+    unmatched = all_bits
+    for char in text:
+        matched = unmatched & query_masks.get(char, 0)
+        unmatched = ((unmatched + matched) | (unmatched - matched)) & all_bits
+    return query_length - unmatched.bit_count()
+
+
+def _result(station: Dict, filtered_stops: List[Dict]) -> Dict:
+    return {
+        'station_id': station['station_id'],
+        'station_name': station['station_name'],
+        'station_lat': station['station_lat'],
+        'station_lon': station['station_lon'],
+        'stops': filtered_stops
+    }
+
+
+def search_stations_linear(stations: List[Dict], query: str, wanted_agencies: Set[str], limit: int) -> List[Dict]:
+    """Reference implementation: score every station. Used to verify the index."""
+    scored_stations = []
+    for station in stations:
+        # Filter by agencies if specified
+        if wanted_agencies:
+            station_agencies = set(stop['agency'] for stop in station['stops'])
+            if not station_agencies.intersection(wanted_agencies):
+                continue
+
+        # Filter stops by agencies if specified
+        filtered_stops = station['stops']
+        if wanted_agencies:
+            filtered_stops = [stop for stop in station['stops'] if stop['agency'] in wanted_agencies]
+
+        # Calculate similarity score with stop count for major hub prioritization
+        score = station_name_similarity(query, station['station_name'], len(filtered_stops))
+
+        # Skip if score is too low
+        if score < MIN_NAME_SIMILARITY:
+            continue
+
+        station_agencies = set(stop['agency'] for stop in filtered_stops)
+        stop_count_bonus, go_bonus, agency_bonus = station_bonuses(query, len(filtered_stops), station_agencies)
+        final_score = score + stop_count_bonus + go_bonus + agency_bonus
+
+        scored_stations.append((final_score, _result(station, filtered_stops)))
+
+    # Sort by score (descending) and limit results
+    scored_stations.sort(key=lambda x: x[0], reverse=True)
+    return [result for _, result in scored_stations[:limit]]
+
+
+class _IndexedStation:
+    __slots__ = ('position', 'station', 'name_lower', 'char_mask', 'agency_stop_counts', 'stop_count',
+                 'bonuses', 'bonus_bound')
+
+    def __init__(self, position: int, station: Dict, char_bits: Dict[Tuple[str, int], int]):
+        self.position = position
+        self.station = station
+        self.name_lower = station['station_name'].lower().strip()
+        # Bit per (character, occurrence), so the characters shared with a query
+        # (counted with multiplicity) are the popcount of the two masks' intersection
+        self.char_mask = 0
+        for char, count in Counter(self.name_lower).items():
+            for occurrence in range(count):
+                self.char_mask |= char_bits.setdefault((char, occurrence), 1 << len(char_bits))
+        self.agency_stop_counts = Counter(stop['agency'] for stop in station['stops'])
+        # Bonuses without an agency filter or mention; a filter only lowers them
+        self.stop_count = len(station['stops'])
+        self.bonuses = station_bonuses('', self.stop_count, set(self.agency_stop_counts))
+        self.bonus_bound = self.bonuses[0] + self.bonuses[1]
+
+
+class StationSearchIndex:
+    """Search structures precomputed from a list of consolidated stations."""
+
+    def __init__(self, stations: List[Dict]):
+        self.stations = stations
+        # (character, occurrence) -> bit in each entry's char_mask
+        self.char_bits: Dict[Tuple[str, int], int] = {}
+        self.entries = [_IndexedStation(position, station, self.char_bits) for position, station in enumerate(stations)]
+
+        # Sorted (text, position) tables for bisecting name and word prefixes
+        self.name_table = sorted((entry.name_lower, entry.position) for entry in self.entries)
+        self.word_table = sorted(
+            (word, entry.position)
+            for entry in self.entries
+            for word in set(entry.name_lower.split())
+        )
+
+        # n-gram (1..NGRAM_SIZE chars) -> positions of names containing it
+        self.ngrams: Dict[str, Set[int]] = {}
+        for entry in self.entries:
+            name = entry.name_lower
+            for size in range(1, NGRAM_SIZE + 1):
+                for start in range(len(name) - size + 1):
+                    self.ngrams.setdefault(name[start:start + size], set()).add(entry.position)
+
+        # (name length, bonus bound) -> positions, for pruning fuzzy candidates a group at a time
+        self.by_length: Dict[Tuple[int, float], List[int]] = {}
+        for entry in self.entries:
+            self.by_length.setdefault((len(entry.name_lower), entry.bonus_bound), []).append(entry.position)
+
+
+    def _prefix_matches(self, table: List, prefix: str) -> Set[int]:
+        positions = set()
+        index = bisect_left(table, (prefix,))
+        while index < len(table) and table[index][0].startswith(prefix):
+            positions.add(table[index][1])
+            index += 1
+        return positions
+
+    def _substring_matches(self, query_lower: str) -> Set[int]:
+        if len(query_lower) <= NGRAM_SIZE:
+            return set(self.ngrams.get(query_lower, ()))
+
+        grams = [query_lower[start:start + NGRAM_SIZE] for start in range(len(query_lower) - NGRAM_SIZE + 1)]
+        postings = sorted((self.ngrams.get(gram, set()) for gram in set(grams)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {position for position in candidates if query_lower in self.entries[position].name_lower}
+
+    def fuzzy_candidates(self, query_lower: str) -> Set[int]:
+        """
+        Stations sharing at least FUZZY_MIN_SHARED_NGRAMS of the query's trigrams,
+        counted from the n-gram postings. Queries shorter than a trigram need every
+        one of their characters instead.
+        """
+        size = NGRAM_SIZE if len(query_lower) >= NGRAM_SIZE else 1
+        grams = {query_lower[start:start + size] for start in range(len(query_lower) - size + 1)}
+        if not grams:
+            return set()
+        needed = len(grams) if size == 1 else max(1, math.ceil(len(grams) * FUZZY_MIN_SHARED_NGRAMS))
+
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.ngrams.get(gram, ()))
+        return {position for position, count in shared.items() if count >= needed}
+
+    def strong_matches(self, query_lower: str) -> Set[int]:
+        """Stations matching exactly, by prefix, by substring or by word prefix."""
+        if not query_lower:
+            return set(range(len(self.entries)))
+        return (
+            self._prefix_matches(self.name_table, query_lower)
+            | self._prefix_matches(self.word_table, query_lower)
+            | self._substring_matches(query_lower)
+        )
+
+    def search(self, query: str, wanted_agencies: Set[str], limit: int) -> List[Dict]:
+        """Return the same results as search_stations_linear, scoring only plausible stations."""
+        query_lower = query.lower().strip()
+        query_counts = Counter(query_lower)
+        wanted = wanted_agencies or None
+        # limit <= 0 slices the full result list, so nothing can be pruned
+        keep = limit if limit > 0 else None
+
+        top = []  # min-heap of (final_score, -position, entry, filtered_stop_count)
+
+        def kth_score() -> float:
+            return top[0][0] if keep and len(top) >= keep else float('-inf')
+
+        def filtered(entry: _IndexedStation):
+            counts = entry.agency_stop_counts
+            if not wanted:
+                return sum(counts.values()), set(counts)
+            agencies = set(counts) & wanted
+            return sum(counts[agency] for agency in agencies), agencies
+
+        def consider(entry: _IndexedStation, stop_count: int, bonuses: tuple):
+            score = station_name_similarity(query, entry.station['station_name'], stop_count)
+            if score < MIN_NAME_SIMILARITY:
+                return
+            final_score = score + bonuses[0] + bonuses[1] + bonuses[2]
+            item = (final_score, -entry.position, entry, stop_count)
+            if keep is None or len(top) < keep:
+                heapq.heappush(top, item)
+            elif item[:2] > top[0][:2]:
+                heapq.heapreplace(top, item)
+
+        # Exact, prefix, substring and word-prefix matches always score >= 0.85
+        strong = self.strong_matches(query_lower)
+        for position in sorted(strong):
+            entry = self.entries[position]
+            stop_count, agencies = filtered(entry)
+            if wanted and not agencies:
+                continue
+            consider(entry, stop_count, station_bonuses(query, stop_count, agencies))
+
+        # Everything else falls back to SequenceMatcher. Bound its ratio from above by
+        # name length, shared characters (as SequenceMatcher.quick_ratio does) and finally
+        # the longest common subsequence, and only score stations whose bound can still
+        # reach the current top results.
+        query_length = len(query_lower)
+        query_masks: Dict[str, int] = {}
+        for index, char in enumerate(query_lower):
+            query_masks[char] = query_masks.get(char, 0) | (1 << index)
+        query_mask = 0
+        for char, count in query_counts.items():
+            for occurrence in range(count):
+                query_mask |= self.char_bits.get((char, occurrence), 0)
+        # Agency-mention bonus any station could get from this query
+        mention_bound = agency_query_bonus(query, set(AGENCY_MENTIONS.values()))
+
+        def length_bound(length: int) -> float:
+            total_length = query_length + length
+            return 2.0 * min(query_length, length) / total_length if total_length else 1.0
+
+        def score_fuzzy(positions):
+            floor = kth_score() - SCORE_EPSILON
+            candidates = []
+            for position in positions:
+                entry = self.entries[position]
+                total_length = query_length + len(entry.name_lower)
+                if not total_length or (wanted and not wanted & entry.agency_stop_counts.keys()):
+                    continue
+                ratio_bound = 2.0 * (query_mask & entry.char_mask).bit_count() / total_length
+                if ratio_bound < MIN_NAME_SIMILARITY or ratio_bound + entry.bonus_bound + mention_bound < floor:
+                    continue
+
+                if wanted or mention_bound:
+                    stop_count, agencies = filtered(entry)
+                    bonuses = station_bonuses(query, stop_count, agencies)
+                else:
+                    stop_count, bonuses = entry.stop_count, entry.bonuses
+                bonus = bonuses[0] + bonuses[1] + bonuses[2]
+                if ratio_bound + bonus < floor:
+                    continue
+
+                candidates.append((-(ratio_bound + bonus), position, False, entry, stop_count, bonuses, bonus))
+
+            # Best bound first; a character-count bound is tightened to the common
+            # subsequence bound only once it reaches the front, so most never need it
+            heapq.heapify(candidates)
+            while candidates and -candidates[0][0] >= kth_score() - SCORE_EPSILON:
+                _, position, refined, entry, stop_count, bonuses, bonus = heapq.heappop(candidates)
+                if refined:
+                    consider(entry, stop_count, bonuses)
+                    continue
+                total_length = query_length + len(entry.name_lower)
+                ratio_bound = 2.0 * _lcs_length(query_masks, query_length, entry.name_lower) / total_length
+                if ratio_bound >= MIN_NAME_SIMILARITY:
+                    heapq.heappush(candidates, (-(ratio_bound + bonus), position, True, entry, stop_count, bonuses, bonus))
+
+        # Stations sharing trigrams with the query are the likely fuzzy matches; scoring
+        # them first raises the cutoff the rest must beat
+        trigram_candidates = self.fuzzy_candidates(query_lower) - strong
+        score_fuzzy(trigram_candidates)
+
+        # Then every other station whose length can still fill limit or beat the cutoff
+        floor = kth_score() - SCORE_EPSILON
+        score_fuzzy(
+            position
+            for (length, bonus_bound), positions in self.by_length.items()
+            if length_bound(length) >= MIN_NAME_SIMILARITY and length_bound(length) + bonus_bound + mention_bound >= floor
+            for position in positions
+            if position not in strong and position not in trigram_candidates
+        )
+
+        ranked = sorted(top, key=lambda item: (-item[0], -item[1]))
+        if keep is None:
+            ranked = ranked[:limit]
+
+        results = []
+        for _, _, entry, _ in ranked:
+            station = entry.station
+            filtered_stops = station['stops']
+            if wanted_agencies:
+                filtered_stops = [stop for stop in station['stops'] if stop['agency'] in wanted_agencies]
+            results.append(_result(station, filtered_stops))
+        return results
+
+
+class StationSearch:
+    """Keeps a StationSearchIndex in step with a StationRegistry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._index: Optional[StationSearchIndex] = None
+
+    @property
+    def index(self) -> StationSearchIndex:
+        stations = self.registry.stations
+        index = self._index
+        if index is None or index.stations is not stations:
+            index = StationSearchIndex(stations)
+            self._index = index
+        return index
+
+    def search(self, query: str, wanted_agencies: Set[str], limit: int) -> List[Dict]:
+        return self.index.search(query, wanted_agencies, limit)
@@ -1,4 +1,7 @@
-from .plugin_manager import PluginManager
+from .plugin_manager import PluginManager, DepartureResult
 from .base_plugin import TransitPlugin, Departure
+from .departure_poller import DeparturePoller
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 
-__all__ = ['PluginManager', 'TransitPlugin', 'Departure']
\ No newline at end of file
+__all__ = ['PluginManager', 'DepartureResult', 'DeparturePoller', 'TransitPlugin', 'Departure',
+           'CircuitBreaker', 'CircuitOpenError']
\ No newline at end of file
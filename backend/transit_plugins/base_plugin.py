@@ -1,6 +1,22 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
+from datetime import datetime
+from zoneinfo import ZoneInfo
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:  # httpx is only needed for the async (ASGI) departures path
+    httpx = None
+
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .departure_cache import DepartureCache
 
 @dataclass
 class Departure:
@@ -15,12 +31,145 @@ class Departure:
     branch_code: str
     route_color: Optional[str]
     route_text_color: Optional[str]
+    departure_timestamp: Optional[int] = None  # Absolute departure time (UNIX seconds)
+    trip_id: Optional[str] = None  # GTFS trip_id, where the upstream feed provides one
+    is_scheduled: bool = False  # From the static GTFS schedule rather than a realtime feed
 
 class TransitPlugin(ABC):
     """Base class for all transit network plugins"""
+
+    # HTTP defaults, overridable per plugin through its config dict
+    DEFAULT_HTTP_CONFIG = {
+        'connect_timeout': 3.05,
+        'read_timeout': 10,
+        'max_retries': 2,
+        'backoff_factor': 0.3,
+        'pool_maxsize': 10,
+    }
+
+    # Seconds a fetched departure list is reused before going upstream again
+    DEFAULT_CACHE_TTL = 15
+
+    # Upstream statuses worth retrying, for both the sync and async clients
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    timezone = ZoneInfo('America/New_York')
     
     def __init__(self, config: Dict = None):
         self.config = config or {}
+        self._session: Optional[requests.Session] = None
+        self._session_lock = threading.Lock()
+        # Async client and the event loop it belongs to (httpx clients are loop-bound)
+        self._async_client = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        cache_ttl = self.config.get('cache_ttl')
+        self.departure_cache = DepartureCache(
+            float(cache_ttl) if cache_ttl not in (None, '') else self.DEFAULT_CACHE_TTL
+        )
+        # Set by PluginManager; guards and records every upstream fetch
+        self.breaker: Optional[CircuitBreaker] = None
+
+    def _http_setting(self, name: str, cast):
+        value = self.config.get(name)
+        if value is None or value == '':
+            value = self.DEFAULT_HTTP_CONFIG[name]
+        return cast(value)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout applied to every upstream request"""
+        return (
+            self._http_setting('connect_timeout', float),
+            self._http_setting('read_timeout', float)
+        )
+
+    def _create_session(self) -> requests.Session:
+        """Build a keep-alive session with connection pooling and retry/backoff"""
+        retry = Retry(
+            total=self._http_setting('max_retries', int),
+            backoff_factor=self._http_setting('backoff_factor', float),
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=None,  # Upstream lookups are read-only, including GraphQL POSTs
+            raise_on_status=False
+        )
+        pool_maxsize = self._http_setting('pool_maxsize', int)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled HTTP session owned by this plugin, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def http_get(self, url: str, **kwargs) -> requests.Response:
+        """GET through the plugin session with the configured timeouts"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def http_post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the plugin session with the configured timeouts"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(url, **kwargs)
+
+    @property
+    def async_client(self) -> 'httpx.AsyncClient':
+        """Pooled non-blocking HTTP client for the running event loop, created on first use"""
+        if httpx is None:
+            raise RuntimeError("The async departures path requires the httpx package")
+
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._close_stale_async_client()
+            connect_timeout, read_timeout = self.timeout
+            pool_maxsize = self._http_setting('pool_maxsize', int)
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=pool_maxsize * 10, max_keepalive_connections=pool_maxsize),
+                # Connection failures are retried by the transport, statuses in _request_async
+                transport=httpx.AsyncHTTPTransport(retries=self._http_setting('max_retries', int))
+            )
+            self._async_client_loop = loop
+        return self._async_client
+
+    def _close_stale_async_client(self):
+        """Close a client left over from another event loop, on that loop if it still runs"""
+        client, loop = self._async_client, self._async_client_loop
+        self._async_client = self._async_client_loop = None
+        if client is not None and loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+    async def aclose_async_client(self):
+        """Close the async client if it belongs to the running loop (ASGI lifespan shutdown)"""
+        if self._async_client is not None and self._async_client_loop is asyncio.get_running_loop():
+            client, self._async_client, self._async_client_loop = self._async_client, None, None
+            await client.aclose()
+
+    async def _request_async(self, method: str, url: str, **kwargs) -> 'httpx.Response':
+        """Request through the async client, retrying RETRY_STATUSES with the configured backoff"""
+        max_retries = self._http_setting('max_retries', int)
+        backoff_factor = self._http_setting('backoff_factor', float)
+        for attempt in range(max_retries + 1):
+            response = await self.async_client.request(method, url, **kwargs)
+            if response.status_code not in self.RETRY_STATUSES or attempt == max_retries:
+                return response
+            await asyncio.sleep(backoff_factor * (2 ** attempt))
+        return response
+
+    async def http_get_async(self, url: str, **kwargs) -> 'httpx.Response':
+        """Non-blocking GET with the configured timeouts and retries"""
+        return await self._request_async('GET', url, **kwargs)
+
+    async def http_post_async(self, url: str, **kwargs) -> 'httpx.Response':
+        """Non-blocking POST with the configured timeouts and retries"""
+        return await self._request_async('POST', url, **kwargs)
     
     @property
     @abstractmethod
@@ -50,6 +199,115 @@ class TransitPlugin(ABC):
         """
         pass
     
+    def fetch_departures_by_stop(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """
+        Fetch departures for stop_ids straight from upstream, bypassing the cache.
+        Returns a dict keyed by stop ID and raises on upstream errors.
+        """
+        raise NotImplementedError(f"{self.network_name} plugin does not support uncached fetches")
+
+    def fetch_upstream(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """
+        fetch_departures_by_stop through the circuit breaker: raises CircuitOpenError
+        while the circuit is open and records the outcome and latency of every call.
+        """
+        breaker = self.breaker
+        if breaker is None:
+            return self.fetch_departures_by_stop(stop_ids)
+        if not breaker.allow_request():
+            raise CircuitOpenError(self.network_name)
+
+        started = time.monotonic()
+        try:
+            departures_by_stop = self.fetch_departures_by_stop(stop_ids)
+        except Exception:
+            breaker.record(False, time.monotonic() - started)
+            raise
+        breaker.record(True, time.monotonic() - started)
+        return departures_by_stop
+
+    async def fetch_departures_by_stop_async(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """
+        Async fetch_departures_by_stop. Networks override this with a non-blocking
+        client; the default runs the sync fetch on a worker thread.
+        """
+        return await asyncio.to_thread(self.fetch_departures_by_stop, stop_ids)
+
+    async def fetch_upstream_async(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """fetch_upstream for the async path, through the same circuit breaker"""
+        breaker = self.breaker
+        if breaker is None:
+            return await self.fetch_departures_by_stop_async(stop_ids)
+        if not breaker.allow_request():
+            raise CircuitOpenError(self.network_name)
+
+        started = time.monotonic()
+        try:
+            departures_by_stop = await self.fetch_departures_by_stop_async(stop_ids)
+        except Exception:
+            breaker.record(False, time.monotonic() - started)
+            raise
+        breaker.record(True, time.monotonic() - started)
+        return departures_by_stop
+
+    async def get_departures_async(self, stop_ids: List[str]) -> List[Departure]:
+        """
+        Async get_departures for a list of stop IDs, served from the same departure
+        cache as the sync path (cache misses go upstream without blocking a thread).
+        """
+        departures_by_stop = await self.departure_cache.get_many_async(stop_ids, self.fetch_upstream_async)
+        departures = [
+            departure
+            for stop_id in dict.fromkeys(stop_ids)
+            for departure in departures_by_stop.get(stop_id, [])
+        ]
+        return self.refresh_departures(departures)
+
+    def get_cached_departures(self, stop_ids: List[str]) -> List[Departure]:
+        """
+        Serve departures for stop_ids from the departure cache, calling
+        fetch_departures_by_stop (through fetch_upstream) for cache misses.
+        Countdowns are recomputed from absolute departure times on every call.
+        """
+        departures_by_stop = self.departure_cache.get_many(stop_ids, self.fetch_upstream)
+        departures = [
+            departure
+            for stop_id in dict.fromkeys(stop_ids)
+            for departure in departures_by_stop.get(stop_id, [])
+        ]
+        return self.refresh_departures(departures)
+
+    def refresh_stops(self, stop_ids: List[str], ttl: Optional[float] = None):
+        """Fetch stop_ids from upstream and store the results in the departure cache"""
+        departures_by_stop = self.fetch_upstream(stop_ids)
+        for stop_id in stop_ids:
+            self.departure_cache.put(stop_id, departures_by_stop.get(stop_id, []), ttl)
+
+    def format_departure_time(self, departure_time: datetime, countdown: int) -> str:
+        """Display string for a departure; networks may override (e.g. '5 min')"""
+        return departure_time.strftime('%H:%M')
+
+    def refresh_departures(self, departures: List[Departure], now: Optional[float] = None) -> List[Departure]:
+        """Return copies of departures with countdown and time recomputed for now"""
+        now_unix = int(now if now is not None else time.time())
+        refreshed = []
+        for departure in departures:
+            if departure.departure_timestamp is None:
+                refreshed.append(departure)
+                continue
+
+            countdown = (departure.departure_timestamp - now_unix) // 60
+            if countdown < -1:
+                continue  # Skip if the trip has already left
+
+            departure_time = datetime.fromtimestamp(departure.departure_timestamp, self.timezone)
+            refreshed.append(replace(
+                departure,
+                countdown=countdown,
+                time=self.format_departure_time(departure_time, countdown)
+            ))
+        return refreshed
+
     def validate_stop_id(self, stop_id: str) -> bool:
         """Validate if a stop ID is valid for this network"""
         return True  # Default implementation
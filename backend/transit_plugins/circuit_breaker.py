@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a network's circuit is open"""
+
+    def __init__(self, network: str):
+        super().__init__(f"{network} circuit is open")
+        self.network = network
+
+
+class CircuitBreaker:
+    """
+    Per-network circuit breaker with rolling health stats for upstream calls.
+
+    closed:    calls go through; failure_threshold consecutive failures (errors,
+               or calls slower than slow_call_seconds) open the circuit.
+    open:      calls are refused for cool_down seconds.
+    half_open: one probe call is let through; success closes the circuit,
+               failure opens it for another cool-down.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, cool_down: float = 30,
+                 slow_call_seconds: Optional[float] = None, window: int = 50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        # (succeeded, latency seconds) for the most recent calls
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        """True while calls would be refused without waiting for a probe slot"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self._opened_at < self.cool_down
+            return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        """Whether an upstream call may go ahead now; counts refused calls"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cool_down:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected_calls += 1
+            return False
+
+    def record_rejection(self, calls: int = 1):
+        """Count calls skipped up front because is_open() was true"""
+        with self._lock:
+            self.rejected_calls += calls
+
+    def record(self, succeeded: bool, latency: float):
+        """Record the outcome of an allowed call"""
+        if succeeded and self.slow_call_seconds is not None and latency > self.slow_call_seconds:
+            succeeded = False
+
+        with self._lock:
+            self.total_calls += 1
+            self._outcomes.append((succeeded, latency))
+
+            if succeeded:
+                self.consecutive_failures = 0
+                if self.state == self.HALF_OPEN:
+                    print(f"{self.name} circuit closed after a successful probe")
+                self.state = self.CLOSED
+                self._probe_in_flight = False
+                return
+
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state == self.CLOSED:
+                    print(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def status(self) -> Dict:
+        """Circuit state and recent error rate / latency, for the health endpoint"""
+        with self._lock:
+            outcomes = list(self._outcomes)
+            state = self.state
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = max(0.0, self.cool_down - (time.monotonic() - self._opened_at))
+                if retry_in == 0:
+                    state = self.HALF_OPEN
+            status = {
+                'state': state,
+                'consecutiveFailures': self.consecutive_failures,
+                'totalCalls': self.total_calls,
+                'totalFailures': self.total_failures,
+                'rejectedCalls': self.rejected_calls,
+                'retryInSeconds': round(retry_in, 1) if retry_in else None,
+            }
+
+        latencies = sorted(latency for _, latency in outcomes)
+        status['recentCalls'] = len(outcomes)
+        status['recentErrorRate'] = (
+            round(sum(1 for succeeded, _ in outcomes if not succeeded) / len(outcomes), 3) if outcomes else None
+        )
+        status['latencyP50Ms'] = round(latencies[len(latencies) // 2] * 1000) if latencies else None
+        status['latencyP95Ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000) if latencies else None
+        return status
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .base_plugin import Departure
+
+FetchFunction = Callable[[List[str]], Dict[str, List['Departure']]]
+AsyncFetchFunction = Callable[[List[str]], Awaitable[Dict[str, List['Departure']]]]
+
+
+class DepartureCache:
+    """
+    Short-TTL per-stop departure cache with single-flight fetching.
+    Concurrent misses for the same stop wait on one upstream fetch instead of
+    each issuing their own.
+    """
+
+    def __init__(self, ttl: float = 15):
+        self.ttl = ttl
+        # stop_id -> (expires_at, fetched_at, departures), monotonic clock
+        self._entries: Dict[str, Tuple[float, float, List['Departure']]] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float):
+        expired = [stop_id for stop_id, entry in self._entries.items() if entry[0] <= now]
+        for stop_id in expired:
+            del self._entries[stop_id]
+
+    def _claim(self, stop_ids: List[str]):
+        """
+        Split stop_ids into cached results, stops another request is fetching
+        (stop_id -> Future) and stops this caller must fetch (registered as in flight).
+        """
+        results = {}
+        waiting: Dict[str, Future] = {}
+        owned: Dict[str, Future] = {}
+
+        now = time.monotonic()
+        with self._lock:
+            for stop_id in dict.fromkeys(stop_ids):
+                entry = self._entries.get(stop_id)
+                if entry and entry[0] > now:
+                    results[stop_id] = entry[2]
+                elif stop_id in self._in_flight:
+                    waiting[stop_id] = self._in_flight[stop_id]
+                else:
+                    owned[stop_id] = self._in_flight[stop_id] = Future()
+        return results, waiting, owned
+
+    def _fail(self, owned: Dict[str, Future], error: Exception):
+        # Share the failure with waiters but don't cache it
+        with self._lock:
+            for stop_id in owned:
+                self._in_flight.pop(stop_id, None)
+        for future in owned.values():
+            future.set_exception(error)
+
+    def _complete(self, owned: Dict[str, Future], fetched: Dict[str, List['Departure']], results: Dict):
+        now = time.monotonic()
+        with self._lock:
+            if self.ttl > 0:
+                self._purge_expired(now)
+            for stop_id in owned:
+                departures = fetched.get(stop_id, [])
+                if self.ttl > 0:
+                    self._entries[stop_id] = (now + self.ttl, now, departures)
+                self._in_flight.pop(stop_id, None)
+                results[stop_id] = departures
+        for stop_id, future in owned.items():
+            future.set_result(results[stop_id])
+
+    def get_many(self, stop_ids: List[str], fetch: FetchFunction) -> Dict[str, List['Departure']]:
+        """
+        Return departures keyed by stop ID, calling fetch once for every stop
+        that is neither cached nor already being fetched by another request.
+        fetch receives the list of missing stop IDs and returns a dict keyed by stop ID.
+        """
+        results, waiting, owned = self._claim(stop_ids)
+
+        if owned:
+            try:
+                fetched = fetch(list(owned))
+            except Exception as e:
+                self._fail(owned, e)
+                raise
+            self._complete(owned, fetched, results)
+
+        for stop_id, future in waiting.items():
+            results[stop_id] = future.result()
+
+        return results
+
+    async def _fetch_owned_async(self, owned: Dict[str, Future], fetch: AsyncFetchFunction) -> Dict[str, List['Departure']]:
+        filled = {}
+        try:
+            fetched = await fetch(list(owned))
+        except BaseException as e:
+            # Waiters get an ordinary error, never a cancellation of their own request
+            self._fail(owned, e if isinstance(e, Exception) else TimeoutError('Upstream fetch was cancelled'))
+            raise
+        self._complete(owned, fetched, filled)
+        return filled
+
+    async def get_many_async(self, stop_ids: List[str], fetch: AsyncFetchFunction) -> Dict[str, List['Departure']]:
+        """
+        get_many for event-loop callers: fetch is awaited and in-flight fetches are
+        awaited, not blocked on. The fetch for owned stops runs as its own task, so
+        a caller cancelled at its deadline still fills the cache for its waiters.
+        """
+        results, waiting, owned = self._claim(stop_ids)
+
+        if owned:
+            fill = asyncio.ensure_future(self._fetch_owned_async(owned, fetch))
+            # Retrieve the error even when no caller is left to await it
+            fill.add_done_callback(lambda task: task.cancelled() or task.exception())
+            results.update(await asyncio.shield(fill))
+
+        for stop_id, future in waiting.items():
+            # Shielded so cancelling this caller doesn't cancel the shared future
+            results[stop_id] = await asyncio.shield(asyncio.wrap_future(future))
+
+        return results
+
+    def peek(self, stop_ids: List[str]) -> Dict[str, List['Departure']]:
+        """Unexpired cached departures for whichever of stop_ids have them, without fetching"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                stop_id: entry[2]
+                for stop_id in dict.fromkeys(stop_ids)
+                for entry in [self._entries.get(stop_id)]
+                if entry and entry[0] > now
+            }
+
+    def put(self, stop_id: str, departures: List['Departure'], ttl: Optional[float] = None):
+        """Store freshly fetched departures for a stop, e.g. from a background refresh"""
+        now = time.monotonic()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._purge_expired(now)
+            self._entries[stop_id] = (now + ttl, now, departures)
+
+    def age(self, stop_id: str) -> Optional[float]:
+        """Seconds since the cached entry for a stop was fetched, or None if absent or expired"""
+        now = time.monotonic()
+        entry = self._entries.get(stop_id)
+        if not entry or entry[0] <= now:
+            return None
+        return now - entry[1]
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,143 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from .plugin_manager import PluginManager
+
+
+class RateBudget:
+    """Token bucket limiting upstream calls per minute for one network"""
+
+    def __init__(self, calls_per_minute: float):
+        self.capacity = calls_per_minute
+        self.tokens = calls_per_minute
+        self.refill_rate = calls_per_minute / 60
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class DeparturePoller:
+    """
+    Background refresher that keeps departures for "hot" stops warm in each
+    plugin's departure cache, so board requests are served from memory.
+
+    Stops become hot when requested through record_request (or when pinned)
+    and are evicted after idle_timeout seconds without a request.
+    """
+
+    def __init__(self, plugin_manager: PluginManager, interval: float = 10,
+                 idle_timeout: float = 600, pinned_stops: Iterable[str] = (),
+                 rate_budgets: Optional[Dict[str, float]] = None):
+        self.plugin_manager = plugin_manager
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.pinned_stops = set(pinned_stops)
+        self.rate_budgets = {
+            network.upper(): RateBudget(calls_per_minute)
+            for network, calls_per_minute in (rate_budgets or {}).items()
+        }
+        # Prefixed stop ID -> monotonic time of the last request for it
+        self._last_requested: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the polling thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='departure-poller', daemon=True)
+        self._thread.start()
+        print(f"Departure poller started (every {self.interval}s)")
+
+    def stop(self):
+        """Stop the polling thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def record_request(self, stop_ids: List[str]):
+        """Mark stops as hot because a board just asked for them"""
+        now = time.monotonic()
+        with self._lock:
+            for stop_id in stop_ids:
+                self._last_requested[stop_id] = now
+
+    def hot_stops(self) -> List[str]:
+        """Stops to keep warm: pinned stops plus recently requested ones"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for stop_id in [s for s, requested_at in self._last_requested.items() if requested_at < cutoff]:
+                del self._last_requested[stop_id]
+            return sorted(self.pinned_stops | set(self._last_requested))
+
+    def _has_budget(self, network: str) -> bool:
+        budget = self.rate_budgets.get(network)
+        return budget is None or budget.try_acquire()
+
+    def poll_once(self):
+        """Refresh every hot stop, stalest first, within each network's rate budget"""
+        # Keep entries alive until the next cycle has had a chance to replace them
+        ttl = self.interval * 2 + 5
+
+        for network, actual_stop_ids in self.plugin_manager.group_stops_by_network(self.hot_stops()).items():
+            plugin = self.plugin_manager.plugins[network]
+            if plugin.breaker and plugin.breaker.is_open():
+                continue  # Leave the upstream alone until its circuit probes again
+            ages = {stop_id: plugin.departure_cache.age(stop_id) for stop_id in actual_stop_ids}
+            stale_first = sorted(
+                actual_stop_ids,
+                key=lambda stop_id: -ages[stop_id] if ages[stop_id] is not None else float('-inf')
+            )
+
+            if network in self.plugin_manager.batch_networks:
+                batches = [stale_first]
+            else:
+                batches = [[stop_id] for stop_id in stale_first]
+
+            for index, batch in enumerate(batches):
+                if not self._has_budget(network):
+                    deferred = sum(len(remaining) for remaining in batches[index:])
+                    print(f"Departure poller: {network} rate budget exhausted, deferring {deferred} stop(s)")
+                    break
+                try:
+                    plugin.refresh_stops(batch, ttl=ttl)
+                except Exception as e:
+                    print(f"Departure poller: error refreshing {network} {batch}: {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Departure poller error: {e}")
+            self._stop_event.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def status(self) -> List[Dict]:
+        """Freshness of every hot stop's cached departures"""
+        now = time.monotonic()
+        with self._lock:
+            last_requested = dict(self._last_requested)
+
+        entries = []
+        for stop_id in self.hot_stops():
+            network = self.plugin_manager.get_network_from_stop_id(stop_id)
+            plugin = self.plugin_manager.plugins.get(network) if network else None
+            age = plugin.departure_cache.age(stop_id.split('_', 1)[1]) if plugin else None
+            requested_at = last_requested.get(stop_id)
+            entries.append({
+                'stopId': stop_id,
+                'pinned': stop_id in self.pinned_stops,
+                'ageSeconds': round(age, 1) if age is not None else None,
+                'lastRequestedSecondsAgo': round(now - requested_at, 1) if requested_at is not None else None
+            })
+        return entries
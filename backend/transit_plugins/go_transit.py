@@ -1,12 +1,13 @@
-import csv
-import requests
+import asyncio
 from datetime import datetime
-from zoneinfo import ZoneInfo
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from .base_plugin import TransitPlugin, Departure
+from .route_index import get_route_index
 
 class GOTransitPlugin(TransitPlugin):
     """GO Transit plugin for fetching real-time departures"""
+
+    NEXT_SERVICE_URL = 'https://api.openmetrolinx.com/OpenDataAPI/api/V1/Stop/NextService/'
     
     @property
     def network_name(self) -> str:
@@ -21,6 +22,7 @@ class GOTransitPlugin(TransitPlugin):
         self.api_key = config.get('api_key') if config else None
         if not self.api_key:
             raise ValueError("GO Transit plugin requires an API key")
+        self.route_index = get_route_index('data/GTFS/GO-GTFS/routes.txt')
     
     def map_route_number(self, route_number: str) -> str:
         """Map GO Transit route numbers to their correct identifiers."""
@@ -29,25 +31,44 @@ class GOTransitPlugin(TransitPlugin):
         }
         return mapping.get(route_number, route_number)
     
+    def format_departure_time(self, departure_time: datetime, countdown: int) -> str:
+        """Show minutes for departures in the next ten minutes, clock time otherwise"""
+        if countdown < 10:
+            return f"{int(countdown)} min"
+        return departure_time.strftime('%H:%M')
+
     def get_departures(self, stop_id: str) -> List[Departure]:
-        """Fetch GO Transit departures for a given stop ID"""
+        """Fetch GO Transit departures for a given stop ID (cached for a short TTL)"""
+        return self.get_cached_departures([stop_id])
+
+    def fetch_departures_by_stop(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """NextService takes one stop code per call"""
+        return {stop_id: self._fetch_departures(stop_id) for stop_id in stop_ids}
+
+    async def fetch_departures_by_stop_async(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """One NextService call per stop, issued concurrently over the non-blocking client"""
+        results = await asyncio.gather(*(self._fetch_departures_async(stop_id) for stop_id in stop_ids))
+        return dict(zip(stop_ids, results))
+
+    async def _fetch_departures_async(self, stop_id: str) -> List[Departure]:
+        response = await self.http_get_async(self.NEXT_SERVICE_URL, params={'StopCode': stop_id, 'key': self.api_key})
+        response.raise_for_status()
+        return self._parse_departures(response.json())
+
+    def _fetch_departures(self, stop_id: str) -> List[Departure]:
+        """Call the NextService API for a stop. Raises on upstream errors."""
         payload = {
             'StopCode': stop_id,
             'key': self.api_key
         }
 
-        try:
-            response = requests.get(
-                'https://api.openmetrolinx.com/OpenDataAPI/api/V1/Stop/NextService/', 
-                params=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-        except Exception as e:
-            print(f"Error fetching GO departures for {stop_id}: {e}")
-            return []
-
-        est_tz = ZoneInfo('America/New_York')
+        response = self.http_get(self.NEXT_SERVICE_URL, params=payload)
+        response.raise_for_status()
+        return self._parse_departures(response.json())
+
+    def _parse_departures(self, data: Dict) -> List[Departure]:
+        """Departures from a NextService response"""
+        est_tz = self.timezone
         extracted_data = []
         
         next_service = data.get('NextService', {})
@@ -73,7 +94,6 @@ class GOTransitPlugin(TransitPlugin):
             try:
                 departure_time = datetime.strptime(departure_time_str, '%Y-%m-%d %H:%M:%S')
                 departure_time = departure_time.replace(tzinfo=est_tz)
-                time = departure_time.strftime('%H:%M')
                 departure_time_unix = int(departure_time.timestamp())
                 
                 # Compute countdown in minutes
@@ -84,8 +104,7 @@ class GOTransitPlugin(TransitPlugin):
                 if countdown < -1:
                     continue  # Skip if the trip has already left
 
-                if countdown < 10:
-                    time = f"{int(countdown)} min"
+                time = self.format_departure_time(departure_time, countdown)
             except Exception as e:
                 print(f"Error parsing departure time {departure_time_str}: {e}")
                 continue
@@ -102,26 +121,12 @@ class GOTransitPlugin(TransitPlugin):
                 countdown=countdown,
                 branch_code=branch_code,
                 route_color=route_color,
-                route_text_color=route_text_color
+                route_text_color=route_text_color,
+                departure_timestamp=departure_time_unix
             ))
 
         return extracted_data
     
     def get_route_colors(self, route_number: str) -> Tuple[Optional[str], Optional[str]]:
         """Get route colors from GTFS data"""
-        file_path = 'data/GTFS/GO-GTFS/routes.txt'
-        
-        try:
-            with open(file_path, 'r') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    # Check if route_id exists in the row before trying to use it
-                    route_id_match = 'route_id' in row and row['route_id'].endswith(f'-{route_number}')
-                    if row['route_short_name'] == str(route_number) or route_id_match:
-                        route_color = f"#{row['route_color']}" if row.get('route_color') else None
-                        route_text_color = f"#{row['route_text_color']}" if row.get('route_text_color') else None
-                        return route_color, route_text_color
-        except Exception as e:
-            print(f"Error reading GO routes file: {e}")
-        
-        return None, None
\ No newline at end of file
+        return self.route_index.get_colors(route_number, match_route_id_suffix=True)
\ No newline at end of file
@@ -1,13 +1,25 @@
-import csv
-import requests
 from datetime import datetime
-from zoneinfo import ZoneInfo
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from .base_plugin import TransitPlugin, Departure
+from .request_batcher import RequestBatcher
+from .route_index import get_route_index
 
 class GRTPlugin(TransitPlugin):
     """Grand River Transit plugin for fetching real-time departures"""
+
+    GRAPHQL_URL = "https://grtivr-prod.regionofwaterloo.9802690.ca/vms/graphql"
+
+    # Seconds to hold a departures query open for other requests' stops
+    DEFAULT_BATCH_WINDOW = 0.025
     
+    def __init__(self, config: dict = None):
+        super().__init__(config)
+        self.route_index = get_route_index('data/GTFS/GRT_GTFS/routes.txt')
+        batch_window = self.config.get('batch_window')
+        self.batcher = RequestBatcher(
+            float(batch_window) if batch_window not in (None, '') else self.DEFAULT_BATCH_WINDOW
+        )
+
     @property
     def network_name(self) -> str:
         return "GRT"
@@ -17,15 +29,61 @@ class GRTPlugin(TransitPlugin):
         return False
     
     def get_departures(self, stop_ids: List[str]) -> List[Departure]:
-        """Fetch GRT departures for given stop IDs (supports batch requests)"""
+        """Fetch GRT departures for given stop IDs (supports batch requests, cached for a short TTL)"""
+        if not stop_ids:
+            return []
+
+        stop_ids = [str(stop_id) for stop_id in stop_ids]
+        return self.get_cached_departures(stop_ids)
+
+    async def get_departures_async(self, stop_ids: List[str]) -> List[Departure]:
+        """Async get_departures (batched and cached like the sync path)"""
         if not stop_ids:
             return []
+
+        return await super().get_departures_async([str(stop_id) for stop_id in stop_ids])
+
+    def fetch_upstream(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """fetch_upstream with concurrent requests' stops combined into one GraphQL query"""
+        return self.batcher.submit(stop_ids, super().fetch_upstream)
+
+    async def fetch_upstream_async(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """fetch_upstream_async, batched with sync and async requests alike"""
+        return await self.batcher.submit_async(stop_ids, super().fetch_upstream_async)
+
+    def fetch_departures_by_stop(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """Fetch departures for stop_ids in one GraphQL call, keyed by stop ID"""
+        return self._by_stop(stop_ids, self._fetch_departures(stop_ids))
+
+    async def fetch_departures_by_stop_async(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """fetch_departures_by_stop over the non-blocking client"""
+        response = await self.http_post_async(self.GRAPHQL_URL, json=self._departures_query(stop_ids),
+                                              headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        return self._by_stop(stop_ids, self._parse_departures(response.json()))
+
+    def _by_stop(self, stop_ids: List[str], departures: List[Departure]) -> Dict[str, List[Departure]]:
+        departures_by_stop = {stop_id: [] for stop_id in stop_ids}
+        for departure in departures:
+            departures_by_stop.setdefault(str(departure.stop_id), []).append(departure)
+        return departures_by_stop
+
+    def _fetch_departures(self, stop_ids: List[str]) -> List[Departure]:
+        """Run the GraphQL departures query for stop_ids. Raises on upstream errors."""
+        headers = {
+            "Content-Type": "application/json"
+        }
         
+        response = self.http_post(self.GRAPHQL_URL, json=self._departures_query(stop_ids), headers=headers)
+        response.raise_for_status()
+        return self._parse_departures(response.json())
+
+    def _departures_query(self, stop_ids: List[str]) -> Dict:
+        """GraphQL request body for the departures at stop_ids"""
         # Convert stop IDs to strings and format for GraphQL
         formatted_stop_ids = [f'"{str(stop_id)}"' for stop_id in stop_ids]
         stop_ids_str = ", ".join(formatted_stop_ids)
         
-        url = "https://grtivr-prod.regionofwaterloo.9802690.ca/vms/graphql"
         query = f"""
         query GetFilteredStopsAndDepartures {{
           stops(filter: {{idIn: [{stop_ids_str}]}}) {{
@@ -44,20 +102,12 @@ class GRTPlugin(TransitPlugin):
           }}
         }}
         """
-        headers = {
-            "Content-Type": "application/json"
-        }
-        
-        try:
-            response = requests.post(url, json={"query": query}, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-        except Exception as e:
-            print(f"Error fetching GRT departures: {e}")
-            return []
-        
+        return {"query": query}
+
+    def _parse_departures(self, data: Dict) -> List[Departure]:
+        """Departures from a GraphQL departures response"""
         extracted_data = []
-        est_tz = ZoneInfo('America/New_York')
+        est_tz = self.timezone
 
         for stop in data.get('data', {}).get('stops', []):
             for arrival in stop.get('arrivals', []):
@@ -113,24 +163,12 @@ class GRTPlugin(TransitPlugin):
                     countdown=countdown,
                     branch_code=branch_code,
                     route_color=route_color,
-                    route_text_color=route_text_color
+                    route_text_color=route_text_color,
+                    departure_timestamp=departure_time_unix
                 ))
                 
         return extracted_data
     
     def get_route_colors(self, route_number: str) -> Tuple[Optional[str], Optional[str]]:
         """Get route colors from GTFS data"""
-        file_path = 'data/GTFS/GRT_GTFS/routes.txt'
-        
-        try:
-            with open(file_path, 'r') as file:
-                csv_reader = csv.DictReader(file)
-                for row in csv_reader:
-                    if row['route_short_name'] == str(route_number):
-                        route_color = f"#{row['route_color']}" if row.get('route_color') else None
-                        route_text_color = f"#{row['route_text_color']}" if row.get('route_text_color') else None
-                        return route_color, route_text_color
-        except Exception as e:
-            print(f"Error reading GRT routes file: {e}")
-        
-        return None, None
\ No newline at end of file
+        return self.route_index.get_colors(route_number)
\ No newline at end of file
@@ -0,0 +1,200 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+from .base_plugin import TransitPlugin, Departure
+from .route_index import get_route_index
+
+try:
+    from google.transit import gtfs_realtime_pb2
+except ImportError:  # gtfs-realtime-bindings is only needed when a TripUpdates feed is configured
+    gtfs_realtime_pb2 = None
+
+class GTFSRealtimePlugin(TransitPlugin):
+    """
+    Departures from an agency's GTFS-Realtime TripUpdates feed. The whole feed is
+    pulled at most once per feed_ttl, decoded and indexed by stop_id, so any
+    number of stop lookups in between are dictionary hits rather than upstream
+    calls. Lookups read the index directly rather than the departure cache,
+    whose TTL would otherwise stack on top of feed_ttl. Routes and headsigns
+    come from the agency's static GTFS through the GTFSScheduler's trip and
+    route tables.
+    """
+
+    DEFAULT_FEED_TTL = 30
+
+    # Networks whose own plugin counts down departures this many minutes away ('5 min')
+    COUNTDOWN_MINUTES = {'GO': 10}
+
+    def __init__(self, network: str, feed_url: str, scheduler, routes_file: str, config: dict = None):
+        super().__init__(config)
+        if gtfs_realtime_pb2 is None:
+            raise RuntimeError("GTFS-Realtime feeds require the gtfs-realtime-bindings package")
+
+        self._network = network
+        self.feed_url = feed_url
+        self.scheduler = scheduler
+        self.route_index = get_route_index(routes_file)
+        feed_ttl = self.config.get('feed_ttl')
+        self.feed_ttl = float(feed_ttl) if feed_ttl not in (None, '') else self.DEFAULT_FEED_TTL
+
+        # Departures by stop_id from the last decoded feed, replaced wholesale on refresh
+        self._index: Dict[str, List[Departure]] = {}
+        self._fetched_at: Optional[float] = None
+        self._etag: Optional[str] = None
+        self._feed_lock = threading.Lock()
+
+    @property
+    def network_name(self) -> str:
+        return self._network
+
+    @property
+    def requires_api_key(self) -> bool:
+        return False
+
+    def format_departure_time(self, departure_time: datetime, countdown: int) -> str:
+        """Match the network's own plugin, e.g. GO's '5 min' for the next ten minutes"""
+        countdown_minutes = self.COUNTDOWN_MINUTES.get(self._network)
+        if countdown_minutes is not None and countdown < countdown_minutes:
+            return f"{int(countdown)} min"
+        return super().format_departure_time(departure_time, countdown)
+
+    def get_departures(self, stop_ids: Union[str, List[str]]) -> List[Departure]:
+        """Departures for one or more stop IDs from the indexed feed"""
+        stop_ids = self._normalize_stop_ids(stop_ids)
+        if not stop_ids:
+            return []
+        # Only a stale feed goes upstream, through the circuit breaker
+        departures_by_stop = self.fetch_departures_by_stop(stop_ids) if self._is_fresh() else self.fetch_upstream(stop_ids)
+        return self._departures_for(stop_ids, departures_by_stop)
+
+    async def get_departures_async(self, stop_ids: Union[str, List[str]]) -> List[Departure]:
+        """Async get_departures; a fresh index is read on the loop, a stale feed is pulled on a worker thread"""
+        stop_ids = self._normalize_stop_ids(stop_ids)
+        if not stop_ids:
+            return []
+        if self._is_fresh():
+            departures_by_stop = self.fetch_departures_by_stop(stop_ids)
+        else:
+            departures_by_stop = await self.fetch_upstream_async(stop_ids)
+        return self._departures_for(stop_ids, departures_by_stop)
+
+    def refresh_stops(self, stop_ids: List[str], ttl: Optional[float] = None):
+        """Pull the feed if it is stale; the index it builds serves every stop"""
+        if not self._is_fresh():
+            self.fetch_upstream(stop_ids)
+
+    @staticmethod
+    def _normalize_stop_ids(stop_ids: Union[str, List[str]]) -> List[str]:
+        if isinstance(stop_ids, str):
+            stop_ids = [stop_ids]
+        return [str(stop_id) for stop_id in stop_ids]
+
+    def _departures_for(self, stop_ids: List[str], departures_by_stop: Dict[str, List[Departure]]) -> List[Departure]:
+        departures = [
+            departure
+            for stop_id in dict.fromkeys(stop_ids)
+            for departure in departures_by_stop.get(stop_id, [])
+        ]
+        return self.refresh_departures(departures)
+
+    def fetch_departures_by_stop(self, stop_ids: List[str]) -> Dict[str, List[Departure]]:
+        """Look stop_ids up in the feed index, pulling the feed first if it is stale"""
+        index = self._current_index()
+        return {stop_id: index.get(stop_id, []) for stop_id in stop_ids}
+
+    def _is_fresh(self) -> bool:
+        """Whether the index was built less than feed_ttl ago"""
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.feed_ttl
+
+    def _current_index(self) -> Dict[str, List[Departure]]:
+        """The stop index, refreshed if older than feed_ttl. Raises if the refresh fails."""
+        if self._is_fresh():
+            return self._index
+
+        with self._feed_lock:
+            # Another caller may have refreshed the feed while we waited for the lock
+            if not self._is_fresh():
+                self._refresh_feed()
+            return self._index
+
+    def _refresh_feed(self):
+        """Pull the TripUpdates feed and rebuild the stop index"""
+        headers = {'If-None-Match': self._etag} if self._etag else {}
+        response = self.http_get(self.feed_url, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+            self._index = self._index_feed(response.content)
+            self._etag = response.headers.get('ETag')
+        self._fetched_at = time.monotonic()
+
+    def _index_feed(self, content: bytes) -> Dict[str, List[Departure]]:
+        """Decode a TripUpdates FeedMessage into departures keyed by stop_id, soonest first"""
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.ParseFromString(content)
+
+        trip_descriptor = gtfs_realtime_pb2.TripDescriptor
+        stop_time_update = gtfs_realtime_pb2.TripUpdate.StopTimeUpdate
+        now_unix = int(time.time())
+
+        index: Dict[str, List[Departure]] = {}
+        for entity in feed.entity:
+            if not entity.HasField('trip_update'):
+                continue
+            trip_update = entity.trip_update
+            trip = trip_update.trip
+            if trip.schedule_relationship == trip_descriptor.CANCELED:
+                continue
+
+            route_number, headsign, branch_code = self._trip_details(trip.trip_id, trip.route_id)
+            route_color, route_text_color = self.get_route_colors(route_number)
+
+            for update in trip_update.stop_time_update:
+                if update.schedule_relationship in (stop_time_update.SKIPPED, stop_time_update.NO_DATA):
+                    continue
+                # Delay-only updates would need the static stop time; feeds we use send absolute times
+                event = update.departure if update.departure.time else update.arrival
+                if not event.time or not update.stop_id:
+                    continue
+                if (event.time - now_unix) // 60 < -1:
+                    continue  # Skip if the trip has already left
+
+                index.setdefault(update.stop_id, []).append(Departure(
+                    stop_id=update.stop_id,
+                    route_number=route_number,
+                    headsign=headsign,
+                    platform=None,  # TripUpdates carry no platform
+                    route_network=self._network,
+                    time='',  # Filled in by refresh_departures on every read
+                    countdown=0,
+                    branch_code=branch_code,
+                    route_color=route_color,
+                    route_text_color=route_text_color,
+                    departure_timestamp=event.time,
+                    trip_id=trip.trip_id or None
+                ))
+
+        for departures in index.values():
+            departures.sort(key=lambda departure: departure.departure_timestamp)
+        return index
+
+    def _trip_details(self, trip_id: str, route_id: str) -> Tuple[str, str, str]:
+        """(route_number, headsign, branch_code) for a trip from the static GTFS tables"""
+        trip = self.scheduler.get_trip(self._network, trip_id) if trip_id else None
+        route_id = route_id or (trip['route_id'] if trip else '')
+        route = self.scheduler.get_route(self._network, route_id) if route_id else None
+
+        route_number = (route or {}).get('route_short_name') or route_id
+        headsign = (trip or {}).get('trip_headsign') or (route or {}).get('route_long_name') or ''
+
+        # Same convention as the GRT API: a single-letter branch code before a dash
+        branch_code = ''
+        if '-' in headsign:
+            before_dash, after_dash = (part.strip() for part in headsign.split('-', 1))
+            if len(before_dash) == 1 and before_dash.isalpha():
+                branch_code, headsign = before_dash, after_dash
+        return route_number, headsign, branch_code
+
+    def get_route_colors(self, route_number: str) -> Tuple[Optional[str], Optional[str]]:
+        """Get route colors from GTFS data"""
+        return self.route_index.get_colors(route_number, match_route_id_suffix=True)
@@ -1,33 +1,141 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 from .base_plugin import TransitPlugin, Departure
+from .circuit_breaker import CircuitBreaker
 from .go_transit import GOTransitPlugin
 from .grt import GRTPlugin
+from .gtfs_realtime import GTFSRealtimePlugin
+
+@dataclass
+class DepartureResult:
+    """Departures gathered across networks for one request"""
+    departures: List[Departure]
+    incomplete_networks: List[str] = field(default_factory=list)
+    # Networks with stops answered from the static schedule instead of realtime
+    scheduled_networks: List[str] = field(default_factory=list)
+    # Prefixed stop IDs already looked up in the static schedule as a fallback
+    scheduled_stop_ids: List[str] = field(default_factory=list)
+
+    @property
+    def partial(self) -> bool:
+        """True if any network failed or missed the deadline"""
+        return bool(self.incomplete_networks)
+
+    def for_stops(self, stop_ids: List[str]) -> 'DepartureResult':
+        """The part of a result fetched for many boards that belongs to one board's prefixed stop_ids"""
+        wanted = {tuple(stop_id.split('_', 1)) for stop_id in stop_ids if '_' in stop_id}
+        wanted = {(network.upper(), actual_stop_id) for network, actual_stop_id in wanted}
+        networks = {network for network, _ in wanted}
+        return DepartureResult(
+            departures=[d for d in self.departures if (d.route_network, str(d.stop_id)) in wanted],
+            incomplete_networks=[network for network in self.incomplete_networks if network in networks],
+            scheduled_networks=[network for network in self.scheduled_networks if network in networks],
+            scheduled_stop_ids=[stop_id for stop_id in self.scheduled_stop_ids if stop_id in stop_ids]
+        )
 
 class PluginManager:
     """Manages transit plugins and routes requests to appropriate networks"""
+
+    # Networks whose plugin accepts a list of stop IDs in a single call
+    BATCH_NETWORKS = {'GRT'}
+
+    # Static routes.txt per network, for route colours
+    ROUTES_FILES = {
+        'GO': 'data/GTFS/GO-GTFS/routes.txt',
+        'GRT': 'data/GTFS/GRT_GTFS/routes.txt',
+    }
     
-    def __init__(self, config: Dict = None):
+    def __init__(self, config: Dict = None, scheduler=None, static_gtfs=None):
         self.config = config or {}
         self.plugins: Dict[str, TransitPlugin] = {}
+        # GTFSScheduler to fall back on when a realtime feed fails or has nothing
+        self.scheduler = scheduler
+        # GTFSScheduler whose trip and route tables name GTFS-Realtime departures
+        self.static_gtfs = static_gtfs or scheduler
+        # Seconds to wait for upstream calls before returning what we have
+        self.deadline = float(self.config.get('REQUEST_DEADLINE') or 8)
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(self.config.get('MAX_UPSTREAM_WORKERS') or 16),
+            thread_name_prefix='upstream'
+        )
         self._load_plugins()
+        # GTFS-Realtime plugins answer any number of stops from one feed pull
+        self.batch_networks = set(self.BATCH_NETWORKS) | {
+            network for network, plugin in self.plugins.items() if isinstance(plugin, GTFSRealtimePlugin)
+        }
+
+        # One circuit breaker per network; calls slower than the deadline count as failures
+        for network, plugin in self.plugins.items():
+            plugin.breaker = CircuitBreaker(
+                network,
+                failure_threshold=int(self.config.get('CIRCUIT_FAILURE_THRESHOLD') or 5),
+                cool_down=float(self.config.get('CIRCUIT_COOL_DOWN') or 30),
+                slow_call_seconds=self.deadline
+            )
     
+    def _shared_plugin_config(self) -> Dict:
+        """HTTP session and cache settings shared by all plugins"""
+        return {
+            'cache_ttl': self.config.get('DEPARTURE_CACHE_TTL'),
+            'connect_timeout': self.config.get('HTTP_CONNECT_TIMEOUT'),
+            'read_timeout': self.config.get('HTTP_READ_TIMEOUT'),
+            'max_retries': self.config.get('HTTP_MAX_RETRIES'),
+            'backoff_factor': self.config.get('HTTP_BACKOFF_FACTOR'),
+            'pool_maxsize': self.config.get('HTTP_POOL_MAXSIZE'),
+        }
+
+    def _trip_updates_plugin(self, network: str) -> Optional[GTFSRealtimePlugin]:
+        """
+        GTFS-Realtime plugin for a network with a TripUpdates feed configured
+        ({network}_TRIP_UPDATES_URL; '{api_key}' is replaced with {network}_TRIP_UPDATES_KEY), else None
+        """
+        feed_url = self.config.get(f'{network}_TRIP_UPDATES_URL')
+        if not feed_url:
+            return None
+        if self.static_gtfs is None:
+            print(f"Warning: GTFS-Realtime plugin for {network} not loaded - no static GTFS for trip names")
+            return None
+
+        return GTFSRealtimePlugin(
+            network,
+            feed_url.replace('{api_key}', self.config.get(f'{network}_TRIP_UPDATES_KEY') or ''),
+            self.static_gtfs,
+            self.ROUTES_FILES[network],
+            {'feed_ttl': self.config.get('TRIP_UPDATES_TTL'), **self._shared_plugin_config()}
+        )
+
     def _load_plugins(self):
         """Load and initialize all available plugins"""
         try:
+            # Networks with a TripUpdates feed configured use it instead of their own API
+            for network in self.ROUTES_FILES:
+                plugin = self._trip_updates_plugin(network)
+                if plugin:
+                    self.plugins[network] = plugin
+                    print(f"Loaded GTFS-Realtime plugin for {network}")
+
             # Load GO Transit plugin
             go_config = {
-                'api_key': self.config.get('GO_API_KEY')
+                'api_key': self.config.get('GO_API_KEY'),
+                **self._shared_plugin_config()
             }
-            if go_config['api_key']:
-                self.plugins['GO'] = GOTransitPlugin(go_config)
-                print("Loaded GO Transit plugin")
-            else:
-                print("Warning: GO Transit plugin not loaded - missing API key")
+            if 'GO' not in self.plugins:
+                if go_config['api_key']:
+                    self.plugins['GO'] = GOTransitPlugin(go_config)
+                    print("Loaded GO Transit plugin")
+                else:
+                    print("Warning: GO Transit plugin not loaded - missing API key")
             
             # Load GRT plugin (no API key required)
-            self.plugins['GRT'] = GRTPlugin()
-            print("Loaded GRT plugin")
+            if 'GRT' not in self.plugins:
+                self.plugins['GRT'] = GRTPlugin({
+                    'batch_window': self.config.get('GRT_BATCH_WINDOW'),
+                    **self._shared_plugin_config()
+                })
+                print("Loaded GRT plugin")
             
         except Exception as e:
             print(f"Error loading plugins: {e}")
@@ -38,11 +146,8 @@ class PluginManager:
             return stop_id.split('_', 1)[0].upper()
         return None
     
-    def get_departures_for_stops(self, stop_ids: List[str]) -> List[Departure]:
-        """Get departures for multiple stops, routing to appropriate plugins"""
-        all_departures = []
-        
-        # Group stop IDs by network
+    def group_stops_by_network(self, stop_ids: List[str]) -> Dict[str, List[str]]:
+        """Group prefixed stop IDs by network, stripping the network prefix"""
         network_stops = {}
         for stop_id in stop_ids:
             network = self.get_network_from_stop_id(stop_id)
@@ -54,24 +159,182 @@ class PluginManager:
                 network_stops[network].append(actual_stop_id)
             else:
                 print(f"Warning: No plugin found for stop {stop_id}")
-        
-        # Fetch departures from each network
-        for network, actual_stop_ids in network_stops.items():
+        return network_stops
+
+    def _fetch(self, network: str, stop_ids) -> List[Departure]:
+        """Run a single upstream call for a network"""
+        return self.plugins[network].get_departures(stop_ids)
+
+    def get_scheduled_departures(self, network: str, stop_ids: List[str]) -> List[Departure]:
+        """Departures for a network's (unprefixed) stop_ids from its compiled static GTFS schedule"""
+        if not self.scheduler or not stop_ids or not self.scheduler.has_store(network):
+            return []
+
+        try:
+            static_departures = self.scheduler.get_static_departures([f"{network}_{stop_id}" for stop_id in stop_ids])
+        except Exception as e:
+            print(f"Error getting scheduled departures from {network} for {stop_ids}: {e}")
+            return []
+
+        plugin = self.plugins.get(network)
+        departures = []
+        for static_departure in static_departures:
+            route_number = static_departure['route_number']
+            route_color, route_text_color = plugin.get_route_colors(route_number) if plugin else (None, None)
+            departures.append(Departure(
+                stop_id=static_departure['stop_id'].split('_', 1)[1],
+                route_number=route_number,
+                headsign=static_departure['headsign'],
+                platform=static_departure['platform'] or None,
+                route_network=network,
+                time=static_departure['time'],
+                countdown=static_departure['countdown'],
+                branch_code=static_departure['branch_code'],
+                route_color=route_color,
+                route_text_color=route_text_color,
+                departure_timestamp=static_departure['departure_timestamp'],
+                trip_id=static_departure['trip_id'],
+                is_scheduled=True
+            ))
+
+        # Same countdown and time formatting as the network's realtime departures
+        return plugin.refresh_departures(departures) if plugin else departures
+
+    def _plan_tasks(self, stop_ids: List[str]):
+        """
+        (tasks, incomplete_networks, fallback_stops) for a request. One task per
+        upstream call: GRT supports batch requests, other networks process one stop
+        at a time. Networks whose circuit is open get no task and go straight to
+        the fallback.
+        """
+        incomplete_networks = set()
+        fallback_stops: Dict[str, List[str]] = {}
+
+        tasks = []
+        for network, actual_stop_ids in self.group_stops_by_network(stop_ids).items():
+            breaker = self.plugins[network].breaker
+            if breaker.is_open():
+                # The calls this request would have made, for the health endpoint
+                breaker.record_rejection(1 if network in self.batch_networks else len(actual_stop_ids))
+                incomplete_networks.add(network)
+                fallback_stops.setdefault(network, []).extend(actual_stop_ids)
+            elif network in self.batch_networks:
+                tasks.append((network, actual_stop_ids))
+            else:
+                tasks.extend((network, actual_stop_id) for actual_stop_id in actual_stop_ids)
+        return tasks, incomplete_networks, fallback_stops
+
+    def _collect(self, network: str, stop_arg, outcome, all_departures: List[Departure],
+                 incomplete_networks: set, fallback_stops: Dict[str, List[str]]):
+        """Fold one task's outcome (departures, an exception, or None for a timeout) into the result"""
+        task_stops = stop_arg if isinstance(stop_arg, list) else [stop_arg]
+        if outcome is None:
+            print(f"Timed out getting departures from {network} for {stop_arg}")
+        elif isinstance(outcome, BaseException):
+            print(f"Error getting departures from {network} for {stop_arg}: {outcome}")
+        elif outcome:
+            all_departures.extend(outcome)
+            return
+        else:
+            fallback_stops.setdefault(network, []).extend(task_stops)
+            return
+        incomplete_networks.add(network)
+        fallback_stops.setdefault(network, []).extend(task_stops)
+
+    def _finish(self, all_departures: List[Departure], incomplete_networks: set,
+                fallback_stops: Dict[str, List[str]]) -> DepartureResult:
+        """Answer fallback stops from the departure cache, then the static schedule"""
+        scheduled_networks = set()
+        scheduled_stop_ids = []
+        for network, fallback_stop_ids in fallback_stops.items():
             plugin = self.plugins[network]
-            try:
-                if network == 'GRT':
-                    # GRT supports batch requests
-                    departures = plugin.get_departures(actual_stop_ids)
-                    all_departures.extend(departures)
-                else:
-                    # Other networks process one stop at a time
-                    for actual_stop_id in actual_stop_ids:
-                        departures = plugin.get_departures(actual_stop_id)
-                        all_departures.extend(departures)
-            except Exception as e:
-                print(f"Error getting departures from {network}: {e}")
-        
-        return all_departures
+            cached = {stop_id: departures for stop_id, departures in plugin.departure_cache.peek(fallback_stop_ids).items() if departures}
+            for stop_id in cached:
+                all_departures.extend(plugin.refresh_departures(cached[stop_id]))
+            fallback_stop_ids = [stop_id for stop_id in fallback_stop_ids if stop_id not in cached]
+
+            scheduled = self.get_scheduled_departures(network, fallback_stop_ids)
+            if self.scheduler:
+                scheduled_stop_ids.extend(f"{network}_{stop_id}" for stop_id in fallback_stop_ids)
+            if scheduled:
+                all_departures.extend(scheduled)
+                scheduled_networks.add(network)
+
+        return DepartureResult(
+            departures=all_departures,
+            incomplete_networks=sorted(incomplete_networks),
+            scheduled_networks=sorted(scheduled_networks),
+            scheduled_stop_ids=scheduled_stop_ids
+        )
+
+    def fetch_departures(self, stop_ids: List[str]) -> DepartureResult:
+        """
+        Get departures for multiple stops, calling every network (and every stop
+        for networks without batch support) concurrently. Calls that have not
+        finished by the request deadline are abandoned and their network is
+        reported as incomplete.
+
+        Networks whose circuit is open are not called at all. Their stops, and
+        stops whose call timed out, failed or came back empty, are answered from
+        the departure cache where it still has them and otherwise from the static
+        schedule when a scheduler is configured.
+        """
+        tasks, incomplete_networks, fallback_stops = self._plan_tasks(stop_ids)
+
+        futures = [self.executor.submit(self._fetch, network, stop_arg) for network, stop_arg in tasks]
+        wait(futures, timeout=self.deadline)
+
+        all_departures = []
+        for (network, stop_arg), future in zip(tasks, futures):
+            if not future.done():
+                future.cancel()
+                outcome = None
+            else:
+                outcome = future.exception() or future.result()
+            self._collect(network, stop_arg, outcome, all_departures, incomplete_networks, fallback_stops)
+
+        return self._finish(all_departures, incomplete_networks, fallback_stops)
+
+    async def fetch_departures_async(self, stop_ids: List[str]) -> DepartureResult:
+        """
+        fetch_departures for event-loop servers: upstream calls run as coroutines
+        over each plugin's non-blocking client, so waiting on them holds no thread.
+        Same deadline, circuit and fallback behaviour as the sync path.
+        """
+        tasks, incomplete_networks, fallback_stops = self._plan_tasks(stop_ids)
+
+        coroutines = [
+            asyncio.ensure_future(self.plugins[network].get_departures_async(
+                stop_arg if isinstance(stop_arg, list) else [stop_arg]
+            ))
+            for network, stop_arg in tasks
+        ]
+        if coroutines:
+            await asyncio.wait(coroutines, timeout=self.deadline)
+
+        all_departures = []
+        for (network, stop_arg), task in zip(tasks, coroutines):
+            if not task.done():
+                task.cancel()
+                outcome = None
+            elif task.cancelled():
+                outcome = None
+            else:
+                outcome = task.exception() or task.result()
+            self._collect(network, stop_arg, outcome, all_departures, incomplete_networks, fallback_stops)
+
+        # Schedule lookups read SQLite or CSV files, so keep them off the event loop
+        if fallback_stops:
+            return await asyncio.to_thread(self._finish, all_departures, incomplete_networks, fallback_stops)
+        return self._finish(all_departures, incomplete_networks, fallback_stops)
+
+    def health(self) -> Dict[str, Dict]:
+        """Circuit state, error rate and latency for every network"""
+        return {network: plugin.breaker.status() for network, plugin in self.plugins.items()}
+
+    def get_departures_for_stops(self, stop_ids: List[str]) -> List[Departure]:
+        """Get departures for multiple stops, routing to appropriate plugins"""
+        return self.fetch_departures(stop_ids).departures
     
     def get_available_networks(self) -> List[str]:
         """Get list of available network names"""
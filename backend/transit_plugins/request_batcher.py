@@ -0,0 +1,110 @@
+"""
+Request Batcher
+
+Combines upstream lookups from concurrent callers into one call. The first
+caller to arrive opens a batch and waits `window` seconds (or until the batch
+holds `max_size` stops) while later callers add their stop IDs to it; it then
+makes a single fetch for the union and every caller takes its own stops from
+the shared result. An upstream error reaches every caller of the batch.
+
+Sync and async callers can share a batch; whichever arrives first fetches
+with its own function, and the rest wait on the batch's future.
+
+A sync leader waits out the window on its own thread, which for plugin calls
+is one of PluginManager's upstream workers. That is accepted: the caller holds
+the thread until its departures arrive either way, and the window (tens of
+milliseconds) is small next to the upstream call it saves. The poller and
+other callers joining the batch hold no extra thread for it.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, wait
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class _Batch:
+    """Stops collected for one upstream call and the future its callers wait on"""
+
+    def __init__(self):
+        self.stop_ids: Dict[str, None] = {}  # Insertion-ordered set
+        self.full: Future = Future()
+        self.result: Future = Future()
+        self.task: Optional[asyncio.Future] = None  # Async leader's dispatch, kept referenced
+
+
+class RequestBatcher:
+    """Merges stop lookups that arrive within a short window into one upstream fetch"""
+
+    def __init__(self, window: float, max_size: int = 100):
+        self.window = window
+        self.max_size = max_size
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+
+    def _join(self, stop_ids: Iterable[str]) -> Tuple[_Batch, bool]:
+        """Add stop_ids to the open batch, opening one if needed. Returns (batch, is_leader)."""
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.stop_ids.update(dict.fromkeys(stop_ids))
+            if len(batch.stop_ids) >= self.max_size:
+                # Close it to newcomers and wake the leader early
+                self._open = None
+                if not batch.full.done():
+                    batch.full.set_result(True)
+            return batch, leader
+
+    def _close(self, batch: _Batch) -> List[str]:
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+            return list(batch.stop_ids)
+
+    @staticmethod
+    def _split(results: Dict[str, T], stop_ids: List[str]) -> Dict[str, T]:
+        return {stop_id: results.get(stop_id, []) for stop_id in stop_ids}
+
+    def submit(self, stop_ids: List[str], fetch: Callable[[List[str]], Dict[str, T]]) -> Dict[str, T]:
+        """fetch(stop_ids), batched with other callers arriving within the window"""
+        if self.window <= 0:
+            return fetch(stop_ids)
+
+        batch, leader = self._join(stop_ids)
+        if leader:
+            wait([batch.full], timeout=self.window)
+            try:
+                batch.result.set_result(fetch(self._close(batch)))
+            except BaseException as e:
+                batch.result.set_exception(e)
+                raise
+        return self._split(batch.result.result(), stop_ids)
+
+    async def _dispatch_async(self, batch: _Batch, fetch: Callable[[List[str]], Awaitable[Dict[str, T]]]):
+        await asyncio.wait([asyncio.wrap_future(batch.full)], timeout=self.window)
+        try:
+            batch.result.set_result(await fetch(self._close(batch)))
+        except BaseException as e:
+            batch.result.set_exception(e)
+
+    async def submit_async(self, stop_ids: List[str],
+                           fetch: Callable[[List[str]], Awaitable[Dict[str, T]]]) -> Dict[str, T]:
+        """
+        Async submit; the leader's fetch runs as its own task so cancelling one caller
+        spares the rest. A cancelled caller's stops still reach the departure cache,
+        whose fill task (DepartureCache.get_many_async) outlives the caller.
+        """
+        if self.window <= 0:
+            return await fetch(stop_ids)
+
+        batch, leader = self._join(stop_ids)
+        if leader:
+            batch.task = asyncio.ensure_future(self._dispatch_async(batch, fetch))
+        result = asyncio.wrap_future(batch.result)
+        # A cancelled caller leaves nobody awaiting this wrapper; retrieve a failure anyway
+        result.add_done_callback(lambda future: future.cancelled() or future.exception())
+        return self._split(await asyncio.shield(result), stop_ids)
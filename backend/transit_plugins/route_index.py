@@ -0,0 +1,96 @@
+import csv
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+RouteColors = Tuple[Optional[str], Optional[str]]
+
+
+class RouteIndex:
+    """In-memory index of a GTFS routes.txt file, reloaded when the file changes"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._loaded = False
+        # Each entry maps a key to (row number, colors) so lookups can honour file order
+        self._by_short_name: Dict[str, Tuple[int, RouteColors]] = {}
+        self._by_id_suffix: Dict[str, Tuple[int, RouteColors]] = {}
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.file_path).st_mtime
+        except OSError:
+            return None
+
+    def _load(self):
+        """Rebuild the index from disk"""
+        by_short_name = {}
+        by_id_suffix = {}
+
+        try:
+            with open(self.file_path, 'r', encoding='utf-8-sig') as file:
+                csv_reader = csv.DictReader(file)
+                for row_number, row in enumerate(csv_reader):
+                    route_color = f"#{row['route_color']}" if row.get('route_color') else None
+                    route_text_color = f"#{row['route_text_color']}" if row.get('route_text_color') else None
+                    entry = (row_number, (route_color, route_text_color))
+
+                    by_short_name.setdefault(row.get('route_short_name', ''), entry)
+
+                    # Index every suffix following a '-' so 'XXXX-KI' can be found by 'KI'
+                    route_id = row.get('route_id', '')
+                    position = route_id.find('-')
+                    while position != -1:
+                        by_id_suffix.setdefault(route_id[position + 1:], entry)
+                        position = route_id.find('-', position + 1)
+        except Exception as e:
+            print(f"Error reading routes file {self.file_path}: {e}")
+
+        self._by_short_name = by_short_name
+        self._by_id_suffix = by_id_suffix
+
+    def _refresh(self):
+        """Reload the index if routes.txt has been modified since the last load"""
+        mtime = self._current_mtime()
+        if self._loaded and mtime == self._mtime:
+            return
+
+        with self._lock:
+            if not self._loaded or mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+                self._loaded = True
+
+    def get_colors(self, route_number: str, match_route_id_suffix: bool = False) -> RouteColors:
+        """
+        Look up (route_color, route_text_color) for a route.
+        Matches on route_short_name and, optionally, on the route_id suffix.
+        """
+        self._refresh()
+        route_number = str(route_number)
+
+        candidates = [self._by_short_name.get(route_number)]
+        if match_route_id_suffix:
+            candidates.append(self._by_id_suffix.get(route_number))
+
+        # The first matching row in the file wins, as with a linear scan
+        matches = [candidate for candidate in candidates if candidate]
+        if not matches:
+            return None, None
+        return min(matches, key=lambda entry: entry[0])[1]
+
+
+_route_indexes: Dict[str, RouteIndex] = {}
+_route_indexes_lock = threading.Lock()
+
+
+def get_route_index(file_path: str) -> RouteIndex:
+    """Return the process-wide RouteIndex for a routes.txt file"""
+    key = os.path.abspath(file_path)
+    route_index = _route_indexes.get(key)
+    if route_index is None:
+        with _route_indexes_lock:
+            route_index = _route_indexes.setdefault(key, RouteIndex(file_path))
+    return route_index
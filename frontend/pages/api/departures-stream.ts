@@ -0,0 +1,98 @@
+import type { NextApiRequest, NextApiResponse } from 'next';
+
+const BACKEND_API_URL = process.env.BACKEND_API_URL as string;
+const API_KEY = process.env.API_KEY as string;
+const ALLOWED_ORIGINS = ['https://transit.braydenpetersen.com', 'http://localhost:3000'];
+
+if (!BACKEND_API_URL) {
+    throw new Error('BACKEND_API_URL is not set');
+}
+
+if (!API_KEY) {
+    throw new Error('API_KEY is not set');
+}
+
+// Relays the backend's server-sent departure stream (/api/departures/stream)
+export const config = {
+    api: {
+        responseLimit: false,
+    },
+};
+
+export default async function handler(req: NextApiRequest, res: NextApiResponse) {
+    // Check origin
+    const origin = req.headers.origin;
+    const referer = req.headers.referer;
+
+    // In production, ensure request is coming from our site
+    if (process.env.NODE_ENV === 'production') {
+        if (!origin && !referer) {
+            return res.status(403).json({ error: 'Direct API access not allowed' });
+        }
+
+        const isAllowedOrigin = ALLOWED_ORIGINS.some(allowed =>
+            origin === allowed || referer?.startsWith(allowed)
+        );
+
+        if (!isAllowedOrigin) {
+            return res.status(403).json({ error: 'Unauthorized origin' });
+        }
+    }
+
+    // Only allow GET requests
+    if (req.method !== 'GET') {
+        return res.status(405).json({ error: 'Method not allowed' });
+    }
+
+    const { stops } = req.query;
+    if (!stops || typeof stops !== 'string') {
+        return res.status(400).json({ error: 'stops parameter is required' });
+    }
+
+    // Stop reading from the backend when the board disconnects
+    const controller = new AbortController();
+    req.on('close', () => controller.abort());
+
+    try {
+        const response = await fetch(`${BACKEND_API_URL}/api/departures/stream?stops=${encodeURIComponent(stops)}`, {
+            method: 'GET',
+            headers: {
+                'X-API-Key': API_KEY,
+                'Accept': 'text/event-stream'
+            },
+            signal: controller.signal
+        });
+
+        if (!response.ok || !response.body) {
+            console.error('Backend stream error:', {
+                status: response.status,
+                statusText: response.statusText
+            });
+            return res.status(response.status === 401 ? 500 : 502).json({ error: 'Failed to open departure stream' });
+        }
+
+        res.writeHead(200, {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache, no-transform',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        });
+
+        const reader = response.body.getReader();
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            res.write(value);
+        }
+        res.end();
+    } catch (error) {
+        if (controller.signal.aborted) {
+            return res.end();
+        }
+        console.error('Error relaying departure stream:', error);
+        if (!res.headersSent) {
+            return res.status(500).json({ error: 'Internal server error' });
+        }
+        res.end();
+    }
+}
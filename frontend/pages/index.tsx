@@ -5,7 +5,7 @@ import { GetServerSideProps } from 'next';
 import { DepartureRow } from '../components/DepartureRow';
 import { DepartureHeader } from '../components/DepartureHeader';
 import { StationSearch } from '../components/StationSearch';
-import { NetworkGroup, RouteGroup, Station } from '../types';
+import { NetworkGroup, RouteGroup, SlimStation } from '../types';
 import GoTransitLogo from '../components/svg/gotransit_logo.svg';
 import GrtLogo from '../components/svg/grt_logo_white.svg';
 
@@ -57,10 +57,41 @@ function Index({ stationName: serverStationName }: PageProps) {
         });
     };
 
-    fetchDepartures();
-    const interval = setInterval(fetchDepartures, 30000);
+    let interval: ReturnType<typeof setInterval> | undefined;
+    const startPolling = () => {
+      if (interval) return;
+      fetchDepartures();
+      interval = setInterval(fetchDepartures, 30000);
+    };
+
+    // Prefer the server-pushed stream; fall back to polling if it can't be used
+    let source: EventSource | undefined;
+    if (typeof EventSource !== 'undefined') {
+      if (isInitialLoad.current) {
+        setIsLoading(true);
+      }
 
-    return () => clearInterval(interval);
+      source = new EventSource(`/api/departures-stream?stops=${router.query.stops}`);
+      source.onmessage = event => {
+        setDepartures(JSON.parse(event.data));
+        setIsLoading(false);
+        isInitialLoad.current = false;
+      };
+      source.onerror = () => {
+        // EventSource reconnects by itself unless the stream was refused outright
+        if (source?.readyState === EventSource.CLOSED) {
+          console.error('Departure stream closed, polling instead');
+          startPolling();
+        }
+      };
+    } else {
+      startPolling();
+    }
+
+    return () => {
+      source?.close();
+      if (interval) clearInterval(interval);
+    };
   }, [router.isReady, router.query.stops]);
 
   // Only fetch station name if not provided by SSR
@@ -329,7 +360,7 @@ export const getServerSideProps: GetServerSideProps<PageProps> = async (context)
 
     // Fetch all consolidated stations and reverse-search for matching station
     // This approach works better for joint-agency stations
-    const response = await fetch(`${apiUrl}/api/consolidated-stations`, {
+    const response = await fetch(`${apiUrl}/api/consolidated-stations?view=slim`, {
       headers: {
         'X-API-Key': apiKey
       }
@@ -341,9 +372,8 @@ export const getServerSideProps: GetServerSideProps<PageProps> = async (context)
 
       if (stations && stations.length > 0) {
         // Find station that contains ALL our stop IDs
-        const matchingStation = stations.find((station: Station) => {
-          const stationStopIds = station.stops.map((s: { stop_id: string }) => s.stop_id);
-          const allMatch = stopIds.every((id: string) => stationStopIds.includes(id));
+        const matchingStation = stations.find((station: SlimStation) => {
+          const allMatch = stopIds.every((id: string) => station.stop_ids.includes(id));
           if (allMatch) {
             console.log('SSR: Found matching station:', station.station_name);
           }
@@ -1,6 +1,8 @@
 export interface DepartureTime {
   time: string;
   countdown: number;
+  // From the static GTFS schedule rather than realtime
+  isScheduled?: boolean;
 }
 
 export interface RouteGroup {
@@ -35,6 +37,15 @@ export interface Station {
   stops: Stop[];
 }
 
+// /api/consolidated-stations?view=slim
+export interface SlimStation {
+  station_id: string;
+  station_name: string;
+  station_lat: number;
+  station_lon: number;
+  stop_ids: string[];
+}
+
 export interface StationSearchResponse {
   query: string;
   total_results: number;
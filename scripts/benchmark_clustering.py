@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Stop Clustering Benchmark
+
+Times cluster_stops_by_proximity (and, for the synthetic feed, the name
+consolidation that follows) on the stops from backend/data/GTFS and on a
+synthetic feed (default 100k stops spread over a metro-sized area), and checks
+that it produces exactly the same clusters, in the same order, as the original
+expanding-cluster scan on inputs small enough for the scan to finish.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from consolidate_stops import (  # noqa: E402
+    CLUSTER_RADIUS,
+    cluster_stops_by_proximity,
+    consolidate_cluster,
+    discover_gtfs_feeds,
+    haversine_distance,
+    load_stops_from_gtfs,
+)
+
+
+def cluster_stops_reference(stops: List[Dict], max_distance: float = 100) -> List[List[Dict]]:
+    """The original O(n^2)+ expanding-cluster scan, kept to verify the grid version."""
+    clusters = []
+    used_stops = set()
+
+    for i, stop in enumerate(stops):
+        if i in used_stops:
+            continue
+
+        cluster = [stop]
+        used_stops.add(i)
+
+        cluster_changed = True
+        while cluster_changed:
+            cluster_changed = False
+
+            for j, other_stop in enumerate(stops):
+                if j in used_stops:
+                    continue
+
+                for cluster_stop in cluster:
+                    distance = haversine_distance(
+                        cluster_stop['stop_lat'], cluster_stop['stop_lon'],
+                        other_stop['stop_lat'], other_stop['stop_lon']
+                    )
+
+                    if distance <= max_distance:
+                        cluster.append(other_stop)
+                        used_stops.add(j)
+                        cluster_changed = True
+                        break
+
+        clusters.append(cluster)
+
+    return clusters
+
+
+def synthetic_stops(count: int, rng: random.Random) -> List[Dict]:
+    """Stops scattered around Kitchener-Waterloo, with some tight groups like real hubs."""
+    stops = []
+    while len(stops) < count:
+        lat = 43.45 + rng.uniform(-0.5, 0.5)
+        lon = -80.49 + rng.uniform(-0.7, 0.7)
+        for _ in range(rng.choice((1, 1, 1, 2, 3, 6))):
+            index = len(stops)
+            stops.append({
+                'stop_id': f"SYN_{index}",
+                'stop_name': f"Synthetic Stop {index}",
+                'stop_lat': lat + rng.gauss(0, 0.0004),
+                'stop_lon': lon + rng.gauss(0, 0.0006),
+                'agency': 'SYN',
+            })
+    return stops[:count]
+
+
+def cluster_ids(clusters: List[List[Dict]]) -> List[List[str]]:
+    return [[stop['stop_id'] for stop in cluster] for cluster in clusters]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark station clustering')
+    parser.add_argument('--gtfs', default='backend/data/GTFS')
+    parser.add_argument('--synthetic', type=int, default=100000, help='Synthetic feed size')
+    parser.add_argument('--verify-synthetic', type=int, default=3000,
+                        help='Synthetic feed size to check against the original scan (0 to skip)')
+    parser.add_argument('--max-distance', type=float, default=CLUSTER_RADIUS,
+                        help='Clustering radius in metres (defaults to the production CLUSTER_RADIUS)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    real_stops = []
+    for agency_name, stops_file in discover_gtfs_feeds(args.gtfs):
+        real_stops.extend(load_stops_from_gtfs(stops_file, agency_name))
+
+    checks = [('GTFS feeds', real_stops)]
+    if args.verify_synthetic:
+        checks.append(('synthetic', synthetic_stops(args.verify_synthetic, rng)))
+
+    for label, stops in checks:
+        grid, grid_time = timed(cluster_stops_by_proximity, stops, args.max_distance)
+        reference, reference_time = timed(cluster_stops_reference, stops, args.max_distance)
+        if cluster_ids(grid) != cluster_ids(reference):
+            print(f"❌ {label}: clusters differ from the original scan")
+            sys.exit(1)
+        print(f"{label}: {len(stops)} stops -> {len(grid)} clusters (identical)")
+        print(f"  original scan: {reference_time:8.2f}s")
+        print(f"  grid index:    {grid_time:8.2f}s")
+
+    if args.synthetic:
+        stops = synthetic_stops(args.synthetic, rng)
+        grid, grid_time = timed(cluster_stops_by_proximity, stops, args.max_distance)
+        print(f"synthetic: {len(stops)} stops -> {len(grid)} clusters")
+        print(f"  grid index:    {grid_time:8.2f}s")
+
+        stations, consolidate_time = timed(lambda: [station for cluster in grid for station in consolidate_cluster(cluster)])
+        print(f"  consolidation: {consolidate_time:8.2f}s ({len(stations)} stations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+GTFS Table Memory Benchmark
+
+Loads each feed's trips.txt and routes.txt in a fresh worker process, once
+as the original dict-of-dicts and once as gtfs_tables.CompactTable, and
+reports the resident memory each adds to the process (what every Gunicorn
+worker pays) along with lookup time. Also checks that both return the same
+record for every key.
+
+--repeat N loads each trips.txt N times with suffixed trip_ids to
+approximate larger feeds.
+"""
+
+import argparse
+import csv
+import gc
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from gtfs_tables import CompactTable, ROUTE_COLUMNS, TRIP_COLUMNS  # noqa: E402
+
+TABLES = (('trips.txt', 'trip_id', TRIP_COLUMNS), ('routes.txt', 'route_id', ROUTE_COLUMNS))
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux), or peak RSS where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def read_rows(path: str, key_column: str, repeat: int):
+    for copy in range(repeat):
+        suffix = f"#{copy}" if copy else ''
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                yield row[key_column] + suffix, row
+
+
+def load_dicts(path: str, key_column: str, columns, repeat: int) -> Dict:
+    """The original loader: one dict per row."""
+    table = {}
+    for key, row in read_rows(path, key_column, repeat):
+        table[key] = {column: row.get(column, '') for column in columns}
+    return table
+
+
+def load_compact(path: str, key_column: str, columns, repeat: int) -> CompactTable:
+    return CompactTable(columns, (
+        (key, [row.get(column, '') for column in columns])
+        for key, row in read_rows(path, key_column, repeat)
+    ))
+
+
+def measure(variant: str, path: str, key_column: str, columns, repeat: int) -> Tuple[int, int, float]:
+    """(rows, RSS added in bytes, seconds to look up every key) in this worker."""
+    keys = [key for key, _ in read_rows(path, key_column, repeat)]
+    gc.collect()
+    before = rss_bytes()
+
+    loader = load_dicts if variant == 'dict' else load_compact
+    table = loader(path, key_column, columns, repeat)
+    gc.collect()
+    added = rss_bytes() - before
+
+    start = time.perf_counter()
+    for key in keys:
+        table.get(key)
+    lookup = time.perf_counter() - start
+    return len(table), added, lookup
+
+
+def verify(path: str, key_column: str, columns, repeat: int) -> bool:
+    reference = load_dicts(path, key_column, columns, repeat)
+    compact = load_compact(path, key_column, columns, repeat)
+    return (
+        len(reference) == len(compact)
+        and list(compact) == sorted(reference, key=lambda key: key.encode('utf-8'))
+        and all(compact[key] == record for key, record in reference.items())
+        and compact.get('\0missing') is None
+    )
+
+
+def feed_tables(gtfs_dir: str) -> List[Tuple[str, str, Tuple[str, ...]]]:
+    found = []
+    for item in sorted(os.listdir(gtfs_dir)):
+        for filename, key_column, columns in TABLES:
+            path = os.path.join(gtfs_dir, item, filename)
+            if os.path.exists(path):
+                found.append((path, key_column, columns))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GTFS trip/route table memory')
+    parser.add_argument('--gtfs', default='backend/data/GTFS')
+    parser.add_argument('--repeat', type=int, default=1, help='Load each trips.txt this many times')
+    args = parser.parse_args()
+
+    tables = feed_tables(args.gtfs)
+    if not tables:
+        print(f"No trips.txt or routes.txt found under {args.gtfs}")
+        return
+
+    context = get_context('spawn')
+    for path, key_column, columns in tables:
+        repeat = args.repeat if key_column == 'trip_id' else 1
+        if not verify(path, key_column, columns, repeat):
+            print(f"❌ {path}: compact table differs from the dict loader")
+            sys.exit(1)
+
+        print(f"{path} (x{repeat})")
+        for variant in ('dict', 'compact'):
+            # A fresh process per measurement so earlier allocations don't hide the cost
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                rows, added, lookup = executor.submit(measure, variant, path, key_column, columns, repeat).result()
+            print(f"  {variant:8} {rows:8} rows  RSS +{added / 1024 / 1024:7.2f} MB  "
+                  f"lookups {lookup * 1e6 / max(rows, 1):6.2f} µs/key")
+
+
+if __name__ == "__main__":
+    main()
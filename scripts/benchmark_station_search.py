@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Station Search Benchmark
+
+Replays type-ahead queries (every prefix of sampled station names, plus
+misspellings) against both the linear scan and StationSearchIndex, checks
+that they return identical result lists for every agency filter and limit,
+and reports p50/p99 latency.
+
+The station list is grown to --stations entries by cloning real stations
+under numbered names, so the index can be measured at network scale.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from station_search import StationSearchIndex, search_stations_linear  # noqa: E402
+
+
+def grow_stations(stations: List[Dict], target: int) -> List[Dict]:
+    """Pad stations up to target entries with renamed copies."""
+    grown = list(stations)
+    copy_number = 1
+    while len(grown) < target:
+        for station in stations:
+            if len(grown) >= target:
+                break
+            clone = dict(station)
+            clone['station_id'] = f"{station['station_id']}_{copy_number}"
+            clone['station_name'] = f"{station['station_name']} {copy_number}"
+            grown.append(clone)
+        copy_number += 1
+    return grown
+
+
+def build_queries(stations: List[Dict], count: int, rng: random.Random) -> List[str]:
+    """Keystroke-by-keystroke prefixes and one-letter typos of random station names."""
+    queries = []
+    while len(queries) < count:
+        name = rng.choice(stations)['station_name']
+        for end in range(1, min(len(name), 12) + 1):
+            prefix = name[:end].strip()
+            if prefix:
+                queries.append(prefix)
+
+        # Misspell one character to exercise the fuzzy path
+        if len(name) > 3:
+            position = rng.randrange(len(name))
+            queries.append((name[:position] + rng.choice('aeiourst') + name[position + 1:]).strip())
+    return queries[:count]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_queries(search, queries: List[str], agencies, limit: int) -> List[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query, agencies, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /api/stations/search ranking')
+    parser.add_argument('--file', default=os.path.join(BACKEND_DIR, 'static', 'consolidated_stations.json'))
+    parser.add_argument('--stations', type=int, default=5000, help='Number of stations to search over')
+    parser.add_argument('--queries', type=int, default=2000, help='Number of queries to replay')
+    parser.add_argument('--limit', type=int, default=10, help='Limit used for timing')
+    parser.add_argument('--check-limits', default='1,3,10,25',
+                        help='Comma-separated limits whose results must match the linear scan')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.file, 'r', encoding='utf-8') as f:
+        stations = grow_stations(json.load(f), args.stations)
+
+    rng = random.Random(args.seed)
+    queries = build_queries(stations, args.queries, rng)
+
+    start = time.perf_counter()
+    index = StationSearchIndex(stations)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Indexed {len(stations)} stations in {build_ms:.1f} ms")
+
+    check_limits = sorted({int(limit) for limit in args.check_limits.split(',')} | {args.limit})
+    for agencies in (set(), {'GO'}, {'GRT'}):
+        for limit in check_limits:
+            mismatches = sum(
+                1 for query in queries
+                if index.search(query, agencies, limit) != search_stations_linear(stations, query, agencies, limit)
+            )
+            if mismatches:
+                print(f"❌ {mismatches} queries ranked differently (agencies={sorted(agencies)}, limit={limit})")
+                sys.exit(1)
+
+        linear = time_queries(lambda q, a, l: search_stations_linear(stations, q, a, l), queries, agencies, args.limit)
+        indexed = time_queries(index.search, queries, agencies, args.limit)
+
+        label = ','.join(sorted(agencies)) or 'all'
+        print(f"\nagencies={label}, {len(queries)} queries, limit={args.limit}")
+        print(f"  linear:  p50 {percentile(linear, 0.5):8.2f} ms   p99 {percentile(linear, 0.99):8.2f} ms")
+        print(f"  indexed: p50 {percentile(indexed, 0.5):8.2f} ms   p99 {percentile(indexed, 0.99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
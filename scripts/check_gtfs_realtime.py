@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+GTFS-Realtime Feed Check
+
+Serves a small recorded TripUpdates feed (fixtures/grt_trip_updates.pb, GRT
+trips from the bundled static GTFS) from a local HTTP server and drives
+GTFSRealtimePlugin against it through refresh_stops and get_departures.
+Checks that the feed decodes, that departures are indexed under the right
+stops soonest first with routes and headsigns from the static tables, that
+cancelled trips, skipped stops and departures already gone are dropped, that
+an unchanged feed is answered with 304 and the existing index reused, and
+that a changed feed is indexed again.
+
+Feed times are shifted so the capture reads as if it were pulled just now.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from google.transit import gtfs_realtime_pb2  # noqa: E402
+
+from gtfs_scheduler import GTFSScheduler  # noqa: E402
+from transit_plugins.gtfs_realtime import GTFSRealtimePlugin  # noqa: E402
+
+# stop_id -> trip_ids expected in the index, soonest first
+EXPECTED_TRIPS = {
+    '1000': ['3832025', '3839297'],  # 3840041 is cancelled
+    '1002': ['3839297', '3832025'],
+}
+# Only skipped, past or NO_DATA updates for these stops
+EXPECTED_ABSENT = {'1001', '1003'}
+
+# Cancelled in the changed feed, which must then be indexed again
+CANCELLED_ON_CHANGE = '3832025'
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves server.feed with an ETag, answering a matching If-None-Match with 304"""
+
+    def do_GET(self):
+        body = self.server.feed
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.statuses.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.server.statuses.append(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-protobuf')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def shifted_feed(path: str) -> gtfs_realtime_pb2.FeedMessage:
+    """The recorded feed with every time moved forward to now"""
+    feed = gtfs_realtime_pb2.FeedMessage()
+    with open(path, 'rb') as f:
+        feed.ParseFromString(f.read())
+
+    offset = int(time.time()) - feed.header.timestamp
+    feed.header.timestamp += offset
+    for entity in feed.entity:
+        for update in entity.trip_update.stop_time_update:
+            for event in (update.arrival, update.departure):
+                if event.time:
+                    event.time += offset
+    return feed
+
+
+def trips_by_stop(plugin: GTFSRealtimePlugin, stop_ids: List[str]) -> Dict[str, List[str]]:
+    return {
+        stop_id: [departure.trip_id for departure in plugin.get_departures([stop_id])]
+        for stop_id in stop_ids
+    }
+
+
+def check_departures(plugin: GTFSRealtimePlugin) -> List[str]:
+    problems = []
+    found = trips_by_stop(plugin, list(EXPECTED_TRIPS) + sorted(EXPECTED_ABSENT))
+    for stop_id, trip_ids in EXPECTED_TRIPS.items():
+        if found[stop_id] != trip_ids:
+            problems.append(f"stop {stop_id}: expected trips {trip_ids}, got {found[stop_id]}")
+    for stop_id in EXPECTED_ABSENT:
+        if found[stop_id]:
+            problems.append(f"stop {stop_id}: expected no departures, got {found[stop_id]}")
+
+    for departure in plugin.get_departures(['1000']):
+        if departure.route_number != '10' or not departure.headsign or not departure.time:
+            problems.append(f"trip {departure.trip_id}: route/headsign/time missing "
+                            f"({departure.route_number!r}, {departure.headsign!r}, {departure.time!r})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check GTFS-Realtime TripUpdates handling against a recorded feed')
+    parser.add_argument('--file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'fixtures', 'grt_trip_updates.pb'))
+    args = parser.parse_args()
+
+    feed = shifted_feed(args.file)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.feed = feed.SerializeToString()
+    server.statuses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    feed_url = f"http://127.0.0.1:{server.server_address[1]}/trip_updates.pb"
+
+    os.chdir(BACKEND_DIR)  # Static GTFS paths are relative to the backend
+    scheduler = GTFSScheduler()
+    # feed_ttl 0 sends every lookup to the server, so conditional requests can be observed
+    plugin = GTFSRealtimePlugin('GRT', feed_url, scheduler, 'data/GTFS/GRT_GTFS/routes.txt', {'feed_ttl': 0})
+    problems = []
+
+    # First pull decodes and indexes the feed
+    plugin.refresh_stops(['1000'])
+    if server.statuses != [200]:
+        problems.append(f"first pull: expected [200], got {server.statuses}")
+    index = plugin._index
+
+    # An unchanged feed is answered with 304 and the index reused
+    problems.extend(check_departures(plugin))
+    if set(server.statuses[1:]) != {304}:
+        problems.append(f"unchanged feed: expected only 304s after the first pull, got {server.statuses}")
+    if plugin._index is not index:
+        problems.append("unchanged feed: index was rebuilt after a 304")
+    if plugin.departure_cache.peek(['1000']):
+        problems.append("get_departures: departure cache was filled")
+
+    # A changed feed is indexed again
+    for entity in feed.entity:
+        if entity.trip_update.trip.trip_id == CANCELLED_ON_CHANGE:
+            entity.trip_update.trip.schedule_relationship = gtfs_realtime_pb2.TripDescriptor.CANCELED
+    server.feed = feed.SerializeToString()
+    requests_before = len(server.statuses)
+    changed = trips_by_stop(plugin, ['1000'])['1000']
+    if server.statuses[requests_before:] != [200]:
+        problems.append(f"changed feed: expected [200], got {server.statuses[requests_before:]}")
+    if changed != ['3839297']:
+        problems.append(f"changed feed: expected stop 1000 trips ['3839297'], got {changed}")
+
+    go_plugin = GTFSRealtimePlugin('GO', feed_url, scheduler, 'data/GTFS/GO-GTFS/routes.txt')
+    go_time = go_plugin.refresh_departures(plugin.get_departures(['1000'])[:1])[0].time
+    if not go_time.endswith(' min'):
+        problems.append(f"GO departures a few minutes out should read 'N min', got {go_time!r}")
+
+    server.shutdown()
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print(f"✅ {len(server.statuses)} feed requests ({server.statuses.count(304)} answered 304), "
+          f"departures indexed across {len(plugin._index)} stops")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+GTFS Store Compiler
+
+Compiles every GTFS feed in backend/data/GTFS that has a stop_times.txt into
+a schedule.sqlite store next to it (see backend/gtfs_store.py). GTFSScheduler
+reads departures from these stores instead of streaming stop_times.txt.
+
+Feeds whose store is newer than their source files are skipped unless
+--force is given.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from gtfs_store import SCHEMA_VERSION, STORE_FILENAME, compile_gtfs_store, source_mtime  # noqa: E402
+
+
+def store_is_current(feed_dir: str) -> bool:
+    """True if the feed's store was built from its current source files with this schema."""
+    store_path = os.path.join(feed_dir, STORE_FILENAME)
+    if not os.path.exists(store_path):
+        return False
+    try:
+        connection = sqlite3.connect(store_path)
+        try:
+            meta = dict(connection.execute('SELECT key, value FROM meta'))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return False
+    return (
+        meta.get('schema_version') == str(SCHEMA_VERSION)
+        and meta.get('source_mtime') == repr(source_mtime(feed_dir))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile GTFS feeds into schedule stores')
+    parser.add_argument('--gtfs', default='backend/data/GTFS')
+    parser.add_argument('--force', action='store_true', help='Recompile stores that are up to date')
+    args = parser.parse_args()
+
+    print("GTFS Store Compiler")
+    print("=" * 40)
+
+    if not os.path.isdir(args.gtfs):
+        print(f"GTFS directory not found: {args.gtfs}")
+        return
+
+    feed_dirs = sorted(
+        os.path.join(args.gtfs, item) for item in os.listdir(args.gtfs)
+        if os.path.exists(os.path.join(args.gtfs, item, 'stop_times.txt'))
+    )
+    if not feed_dirs:
+        print("No feeds with stop_times.txt found.")
+        return
+
+    for feed_dir in feed_dirs:
+        if not args.force and store_is_current(feed_dir):
+            print(f"{feed_dir}: up to date")
+            continue
+
+        start = time.perf_counter()
+        store_path = compile_gtfs_store(feed_dir)
+        size_mb = os.path.getsize(store_path) / 1024 / 1024
+        print(f"{feed_dir}: compiled {store_path} ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
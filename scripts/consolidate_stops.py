@@ -8,15 +8,34 @@ and groups transit stops based on:
 2. Name similarity (fuzzy matching)
 
 Creates consolidated station records for unified departure board display.
+
+With --incremental, diffs each feed's stops against the stops already stored in
+consolidated_stations.json and rebuilds only the stations around changed stops,
+keeping existing station IDs.
 """
 
+import argparse
 import csv
 import json
 import math
 import os
 import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
-from typing import List, Dict, Tuple
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; distances fall back to pure Python
+    np = None
+
+# Stops within this many meters of each other (directly or through a chain) are clustered
+CLUSTER_RADIUS = 200
+
+GTFS_ROOT_DIR = 'backend/data/GTFS'
+OUTPUT_FILE = 'backend/static/consolidated_stations.json'
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate the great circle distance between two points in meters."""
@@ -33,8 +52,9 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     
     return R * c
 
+@lru_cache(maxsize=None)
 def normalize_stop_name(name: str) -> str:
-    """Normalize stop name for comparison."""
+    """Normalize stop name for comparison (memoized; the same names recur across clusters)."""
     # Remove common suffixes/prefixes and standardize
     name = name.lower().strip()
     
@@ -60,9 +80,10 @@ def normalize_stop_name(name: str) -> str:
 
 def name_similarity(name1: str, name2: str) -> float:
     """Calculate similarity between two stop names (0-1)."""
-    norm1 = normalize_stop_name(name1)
-    norm2 = normalize_stop_name(name2)
-    
+    return normalized_name_similarity(normalize_stop_name(name1), normalize_stop_name(name2))
+
+def normalized_name_similarity(norm1: str, norm2: str) -> float:
+    """name_similarity for names already passed through normalize_stop_name."""
     # Direct match after normalization
     if norm1 == norm2:
         return 1.0
@@ -74,6 +95,23 @@ def name_similarity(name1: str, name2: str) -> float:
     # Fuzzy string matching
     return SequenceMatcher(None, norm1, norm2).ratio()
 
+def names_similar(norm1: str, norm2: str, min_similarity: float) -> bool:
+    """
+    normalized_name_similarity(norm1, norm2) >= min_similarity, skipping the full
+    SequenceMatcher pass when its cheap upper bounds already fall short.
+    """
+    if norm1 == norm2:
+        return min_similarity <= 1.0
+    if norm1 in norm2 or norm2 in norm1:
+        return min_similarity <= 0.9
+
+    matcher = SequenceMatcher(None, norm1, norm2)
+    return (
+        matcher.real_quick_ratio() >= min_similarity
+        and matcher.quick_ratio() >= min_similarity
+        and matcher.ratio() >= min_similarity
+    )
+
 def discover_gtfs_feeds(gtfs_root_dir: str) -> List[Tuple[str, str]]:
     """
     Discover all GTFS feeds in the root directory.
@@ -102,79 +140,310 @@ def discover_gtfs_feeds(gtfs_root_dir: str) -> List[Tuple[str, str]]:
     
     return gtfs_feeds
 
-def load_stops_from_gtfs(file_path: str, agency_prefix: str) -> List[Dict]:
-    """Load stops from a GTFS stops.txt file."""
-    stops = []
+class StopTable:
+    """
+    Stops stored column by column: parallel lists of IDs, names and agencies and
+    float arrays of coordinates. Indexing a row builds the same stop dict that
+    load_stops_from_gtfs returns, so tables can stand in for lists of stops.
+    """
+
+    # Optional stops.txt columns carried through to the output as-is
+    TEXT_COLUMNS = ('stop_code', 'zone_id', 'stop_url', 'wheelchair_boarding', 'platform_code')
+
+    def __init__(self):
+        self.original_stop_ids: List[str] = []
+        self.stop_names: List[str] = []
+        self.stop_lats = array('d')
+        self.stop_lons = array('d')
+        self.agencies: List[str] = []
+        self.text_columns: Dict[str, List[str]] = {column: [] for column in self.TEXT_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.original_stop_ids)
+
+    def __getitem__(self, index: int) -> Dict:
+        stop = {
+            'stop_id': self.stop_id(index),
+            'original_stop_id': self.original_stop_ids[index],
+            'stop_name': self.stop_names[index],
+            'stop_lat': self.stop_lats[index],
+            'stop_lon': self.stop_lons[index],
+            'agency': self.agencies[index],
+        }
+        for column in self.TEXT_COLUMNS:
+            stop[column] = self.text_columns[column][index]
+        return stop
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def stop_id(self, index: int) -> str:
+        """Agency-prefixed stop ID (e.g. 'GRT_1078') without building the row."""
+        return f"{self.agencies[index]}_{self.original_stop_ids[index]}"
+
+    def extend(self, other: 'StopTable'):
+        self.original_stop_ids.extend(other.original_stop_ids)
+        self.stop_names.extend(other.stop_names)
+        self.stop_lats.extend(other.stop_lats)
+        self.stop_lons.extend(other.stop_lons)
+        self.agencies.extend(other.agencies)
+        for column in self.TEXT_COLUMNS:
+            self.text_columns[column].extend(other.text_columns[column])
+
+def load_stop_table(file_path: str, agency_prefix: str) -> StopTable:
+    """Load stops from a GTFS stops.txt file into a StopTable."""
+    table = StopTable()
     
     try:
         with open(file_path, 'r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
+            reader = csv.reader(file)
+            header = next(reader, [])
+            positions = {name: index for index, name in enumerate(header)}
+            width = len(header)
+
+            def column(row: List[str], name: str, default: Optional[str] = '') -> Optional[str]:
+                index = positions.get(name)
+                return default if index is None else row[index]
+
             for row in reader:
+                # Skip blank lines
+                if not row:
+                    continue
+                # Short rows get None for the missing fields, as with csv.DictReader
+                if len(row) < width:
+                    row = row + [None] * (width - len(row))
+
                 # Skip rows with missing coordinates
-                if not row.get('stop_lat') or not row.get('stop_lon'):
+                stop_lat = column(row, 'stop_lat', None)
+                stop_lon = column(row, 'stop_lon', None)
+                if not stop_lat or not stop_lon:
                     continue
-                
-                stop = {
-                    'stop_id': f"{agency_prefix}_{row['stop_id']}",
-                    'original_stop_id': row['stop_id'],
-                    'stop_name': row['stop_name'].strip(),
-                    'stop_lat': float(row['stop_lat']),
-                    'stop_lon': float(row['stop_lon']),
-                    'agency': agency_prefix,
-                    'stop_code': row.get('stop_code', ''),
-                    'zone_id': row.get('zone_id', ''),
-                    'stop_url': row.get('stop_url', ''),
-                    'wheelchair_boarding': row.get('wheelchair_boarding', ''),
-                    'platform_code': row.get('platform_code', ''),
-                }
-                stops.append(stop)
+
+                original_stop_id = row[positions['stop_id']]
+                stop_name = row[positions['stop_name']].strip()
+                lat, lon = float(stop_lat), float(stop_lon)
+                text_values = [column(row, name) for name in StopTable.TEXT_COLUMNS]
+
+                table.original_stop_ids.append(original_stop_id)
+                table.stop_names.append(stop_name)
+                table.stop_lats.append(lat)
+                table.stop_lons.append(lon)
+                table.agencies.append(agency_prefix)
+                for name, value in zip(StopTable.TEXT_COLUMNS, text_values):
+                    table.text_columns[name].append(value)
     except FileNotFoundError:
         print(f"Warning: Could not find {file_path}")
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
     
-    return stops
+    return table
+
+def load_stops_from_gtfs(file_path: str, agency_prefix: str) -> List[Dict]:
+    """Load stops from a GTFS stops.txt file."""
+    return list(load_stop_table(file_path, agency_prefix))
+
+def _load_feed(feed: Tuple[str, str]) -> StopTable:
+    agency_name, stops_file = feed
+    return load_stop_table(stops_file, agency_name)
+
+def load_all_stops(gtfs_feeds: List[Tuple[str, str]], workers: Optional[int] = None) -> StopTable:
+    """Stops from every feed, in feed order. Feeds are parsed in parallel processes."""
+    if len(gtfs_feeds) > 1:
+        with ProcessPoolExecutor(max_workers=workers or min(len(gtfs_feeds), os.cpu_count() or 1)) as executor:
+            tables = list(executor.map(_load_feed, gtfs_feeds))
+    else:
+        tables = [_load_feed(feed) for feed in gtfs_feeds]
+
+    all_stops = StopTable()
+    for (agency_name, _), table in zip(gtfs_feeds, tables):
+        all_stops.extend(table)
+        print(f"Loaded {len(table)} stops from {agency_name}")
+    return all_stops
+
+def stop_coordinates(stops) -> Tuple[Sequence[float], Sequence[float]]:
+    """(latitudes, longitudes) of a StopTable or a list of stop dicts."""
+    if isinstance(stops, StopTable):
+        return stops.stop_lats, stops.stop_lons
+    return [stop['stop_lat'] for stop in stops], [stop['stop_lon'] for stop in stops]
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """NumPy version of haversine_distance over arrays of points, in meters."""
+    R = 6371000  # Earth's radius in meters
+
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = np.radians(lat2 - lat1)
+    delta_lon = np.radians(lon2 - lon1)
+
+    a = (np.sin(delta_lat / 2) ** 2 +
+         np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+def grid_cells(lats: Sequence[float], lons: Sequence[float], max_distance: float) -> Tuple[List[int], List[int], int]:
+    """
+    Bucket points into a lat/lon grid whose cells are at least max_distance across.
+    Returns (row per point, column per point, number of columns).
+    """
+    R = 6371000  # Earth's radius in meters
+
+    # Latitude: distance is never less than R * delta_lat
+    cell_lat = max(math.degrees(max_distance / R), 1e-9) * (1 + 1e-9)
+
+    # Longitude: distance is never less than (2/pi) * R * cos(lat) * delta_lon, taken at the
+    # highest latitude present; columns wrap around the antimeridian
+    max_abs_lat = min(max(abs(lat) for lat in lats) + cell_lat, 90.0)
+    cos_lat = math.cos(math.radians(max_abs_lat))
+    cell_lon = cell_lat * (math.pi / 2) / cos_lat if cos_lat > 1e-12 else 360.0
+    columns = max(1, int(360.0 // min(cell_lon, 360.0)))
+
+    rows = [math.floor(lat / cell_lat) for lat in lats]
+    cols = [math.floor((lon + 180.0) / 360.0 * columns) % columns for lon in lons]
+    return rows, cols, columns
+
+def nearby_pairs_python(lats: Sequence[float], lons: Sequence[float], max_distance: float) -> List[Tuple[int, int]]:
+    """(i, j) pairs with i < j of points within max_distance meters, one haversine at a time."""
+    rows, cols, columns = grid_cells(lats, lons, max_distance)
+
+    cells = {}
+    for index, cell in enumerate(zip(rows, cols)):
+        cells.setdefault(cell, []).append(index)
+
+    pairs = []
+    for (row, column), members in cells.items():
+        nearby_columns = {(column + offset) % columns for offset in (-1, 0, 1)}
+        candidates = [
+            other
+            for nearby_row in (row - 1, row, row + 1)
+            for nearby_column in nearby_columns
+            for other in cells.get((nearby_row, nearby_column), ())
+        ]
+        for i in members:
+            lat, lon = lats[i], lons[i]
+            for j in candidates:
+                if j <= i:
+                    continue
+                distance = haversine_distance(lat, lon, lats[j], lons[j])
+                if distance <= max_distance:
+                    pairs.append((i, j))
+
+    return pairs
+
+def nearby_pairs_numpy(lats: Sequence[float], lons: Sequence[float], max_distance: float) -> List[Tuple[int, int]]:
+    """
+    Same pairs as nearby_pairs_python, with candidate pairs generated and measured in batches.
+    Pairs within a micrometre of max_distance are re-measured with haversine_distance so
+    float differences between NumPy and math can't change the result.
+    """
+    rows, cols, columns = grid_cells(lats, lons, max_distance)
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    lat_values = np.asarray(lats, dtype=np.float64)
+    lon_values = np.asarray(lons, dtype=np.float64)
+
+    # Stops sorted by cell, so each neighbouring cell is a contiguous range
+    keys = (rows - rows.min() + 1) * columns + cols
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    stop_indexes = np.arange(len(lat_values))
+
+    first_parts, second_parts = [], []
+    for row_offset in (-1, 0, 1):
+        for column_offset in sorted({offset % columns for offset in (-1, 0, 1)}):
+            targets = (rows - rows.min() + 1 + row_offset) * columns + (cols + column_offset) % columns
+            starts = np.searchsorted(sorted_keys, targets, side='left')
+            counts = np.searchsorted(sorted_keys, targets, side='right') - starts
+
+            # Expand each stop's range of candidates into explicit (i, j) pairs
+            first = np.repeat(stop_indexes, counts)
+            range_starts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+            second = order[range_starts + np.arange(counts.sum())]
+
+            keep = first < second
+            first_parts.append(first[keep])
+            second_parts.append(second[keep])
+
+    first = np.concatenate(first_parts)
+    second = np.concatenate(second_parts)
+    distances = haversine_distances(lat_values[first], lon_values[first], lat_values[second], lon_values[second])
+
+    within = distances <= max_distance
+    borderline = np.flatnonzero(np.abs(distances - max_distance) <= 1e-6)
+    for index in borderline.tolist():
+        i, j = int(first[index]), int(second[index])
+        within[index] = haversine_distance(lats[i], lons[i], lats[j], lons[j]) <= max_distance
+
+    return list(zip(first[within].tolist(), second[within].tolist()))
+
+def build_neighbor_lists(stops: List[Dict], max_distance: float) -> List[List[int]]:
+    """
+    Adjacency lists of stops within max_distance meters of each other.
+    Stops are bucketed into a lat/lon grid so only stops in the same or
+    neighbouring cells need a distance check. Uses NumPy when it's installed.
+    """
+    neighbors = [[] for _ in stops]
+    if not stops:
+        return neighbors
+
+    lats, lons = stop_coordinates(stops)
+    pairs = nearby_pairs_numpy(lats, lons, max_distance) if np is not None else nearby_pairs_python(lats, lons, max_distance)
+    for i, j in pairs:
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+
+    return neighbors
 
 def cluster_stops_by_proximity(stops: List[Dict], max_distance: float = 100) -> List[List[Dict]]:
     """
     Group stops that are within max_distance meters of each other.
     Uses expanding radius: each new stop added to cluster expands the search area.
+
+    Clusters are the connected components of the "within max_distance" graph,
+    found with a spatial grid and union-find. Members are ordered the way the
+    original expanding scan added them: repeated passes in file order, each
+    adding stops next to any stop already in the cluster.
     """
-    clusters = []
-    used_stops = set()
+    neighbors = build_neighbor_lists(stops, max_distance)
 
-    for i, stop in enumerate(stops):
-        if i in used_stops:
-            continue
+    # Union-find over neighbouring stops
+    parent = list(range(len(stops)))
 
-        # Start a new cluster with this stop
-        cluster = [stop]
-        used_stops.add(i)
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
 
-        # Keep expanding the cluster by checking proximity to ALL stops in cluster
-        # This creates a "growing radius" effect
-        cluster_changed = True
-        while cluster_changed:
-            cluster_changed = False
+    for i, adjacent in enumerate(neighbors):
+        for j in adjacent:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
 
-            for j, other_stop in enumerate(stops):
-                if j in used_stops:
-                    continue
+    # Components in order of their first stop, members in file order
+    components = {}
+    for i in range(len(stops)):
+        components.setdefault(find(i), []).append(i)
 
-                # Check if this stop is within max_distance of ANY stop in the cluster
-                for cluster_stop in cluster:
-                    distance = haversine_distance(
-                        cluster_stop['stop_lat'], cluster_stop['stop_lon'],
-                        other_stop['stop_lat'], other_stop['stop_lon']
-                    )
+    clusters = []
+    for members in components.values():
+        seed = members[0]
+        in_cluster = {seed}
+        order = [seed]
 
-                    if distance <= max_distance:
-                        cluster.append(other_stop)
-                        used_stops.add(j)
-                        cluster_changed = True
-                        break  # Stop checking other cluster stops for this candidate
+        # Replay the expanding passes within this component
+        cluster_changed = True
+        while cluster_changed and len(order) < len(members):
+            cluster_changed = False
+            for j in members:
+                if j not in in_cluster and any(k in in_cluster for k in neighbors[j]):
+                    in_cluster.add(j)
+                    order.append(j)
+                    cluster_changed = True
 
-        clusters.append(cluster)
+        clusters.append([stops[i] for i in order])
 
     return clusters
 
@@ -195,7 +464,8 @@ def consolidate_cluster(cluster: List[Dict], min_name_similarity: float = 0.6) -
         }
         return [station]
     
-    # Group stops by name similarity
+    # Group stops by name similarity (each name normalized once)
+    normalized_names = [normalize_stop_name(stop['stop_name']) for stop in cluster]
     name_groups = []
     used_stops = set()
     
@@ -212,8 +482,7 @@ def consolidate_cluster(cluster: List[Dict], min_name_similarity: float = 0.6) -
             if j in used_stops:
                 continue
             
-            similarity = name_similarity(stop['stop_name'], other_stop['stop_name'])
-            if similarity >= min_name_similarity:
+            if names_similar(normalized_names[i], normalized_names[j], min_name_similarity):
                 group.append(other_stop)
                 used_stops.add(j)
         
@@ -289,13 +558,211 @@ def consolidate_cluster(cluster: List[Dict], min_name_similarity: float = 0.6) -
     
     return stations
 
+def stops_connected_to(stops: List[Dict], seeds: List[int], max_distance: float) -> List[int]:
+    """
+    Indexes (in list order) of every stop in the same proximity cluster as any seed.
+    Walks outward from the seeds through the grid, so only the grid cells around
+    those clusters are ever examined.
+    """
+    if not seeds:
+        return []
+
+    lats, lons = stop_coordinates(stops)
+    rows, cols, columns = grid_cells(lats, lons, max_distance)
+    cells = {}
+    for index, cell in enumerate(zip(rows, cols)):
+        cells.setdefault(cell, []).append(index)
+
+    reached = set(seeds)
+    pending = list(reached)
+    while pending:
+        i = pending.pop()
+        row, column = rows[i], cols[i]
+        for nearby_row in (row - 1, row, row + 1):
+            for nearby_column in {(column + offset) % columns for offset in (-1, 0, 1)}:
+                for j in cells.get((nearby_row, nearby_column), ()):
+                    if j in reached:
+                        continue
+                    distance = haversine_distance(lats[i], lons[i], lats[j], lons[j])
+                    if distance <= max_distance:
+                        reached.add(j)
+                        pending.append(j)
+
+    return sorted(reached)
+
+def diff_stops(old_stops: List[Dict], new_stops: List[Dict]) -> Tuple[set, set, set]:
+    """(added, removed, modified) stop_ids between two snapshots of stops."""
+    old_by_id = {stop['stop_id']: stop for stop in old_stops}
+    new_by_id = {stop['stop_id']: stop for stop in new_stops}
+
+    added = set(new_by_id) - set(old_by_id)
+    removed = set(old_by_id) - set(new_by_id)
+    modified = {stop_id for stop_id in set(old_by_id) & set(new_by_id) if old_by_id[stop_id] != new_by_id[stop_id]}
+    return added, removed, modified
+
+def unique_station_id(station_id: str, used_station_ids: set) -> str:
+    """station_id, or station_id with a numeric suffix if it's already taken."""
+    unique_id = station_id
+    counter = 1
+    while unique_id in used_station_ids:
+        unique_id = f"{station_id}-{counter}"
+        counter += 1
+    return unique_id
+
+def consolidate_incremental(old_stations: List[Dict], new_stops: List[Dict],
+                            max_distance: float = CLUSTER_RADIUS) -> Tuple[List[Dict], Dict]:
+    """
+    Update old_stations for a new set of stops without rebuilding unaffected stations.
+
+    Only proximity clusters containing an added, removed or modified stop (before
+    or after the change) are re-clustered and re-consolidated. Rebuilt stations
+    keep the station_id of the old station they share the most stops with.
+
+    Returns (stations, patch) where patch lists removed station IDs and the
+    stations that were added or rebuilt.
+    """
+    old_stops = [stop for station in old_stations for stop in station['stops']]
+    added, removed, modified = diff_stops(old_stops, new_stops)
+    changed = added | removed | modified
+    if not changed:
+        return old_stations, {'removed_station_ids': [], 'stations': []}
+
+    # Clusters touched by the change, as they were and as they are now
+    old_region = stops_connected_to(
+        old_stops, [i for i, stop in enumerate(old_stops) if stop['stop_id'] in changed], max_distance
+    )
+    old_region_ids = {old_stops[i]['stop_id'] for i in old_region}
+    new_region = stops_connected_to(
+        new_stops,
+        [i for i, stop in enumerate(new_stops) if stop['stop_id'] in changed or stop['stop_id'] in old_region_ids],
+        max_distance
+    )
+    affected_ids = old_region_ids | {new_stops[i]['stop_id'] for i in new_region}
+
+    # Every old station with a stop in the region is replaced
+    replaced = [station for station in old_stations if any(stop['stop_id'] in affected_ids for stop in station['stops'])]
+    replaced_by_stop = {stop['stop_id']: station['station_id'] for station in replaced for stop in station['stops']}
+
+    rebuilt = []
+    for cluster in cluster_stops_by_proximity([new_stops[i] for i in new_region], max_distance):
+        rebuilt.extend(consolidate_cluster(cluster))
+
+    # Reuse old station IDs, best stop overlap first
+    overlaps = []
+    for index, station in enumerate(rebuilt):
+        counts = {}
+        for stop in station['stops']:
+            old_id = replaced_by_stop.get(stop['stop_id'])
+            if old_id:
+                counts[old_id] = counts.get(old_id, 0) + 1
+        overlaps.extend((-count, index, old_id) for old_id, count in counts.items())
+
+    assigned = {}
+    reused_ids = set()
+    for _, index, old_id in sorted(overlaps):
+        if index not in assigned and old_id not in reused_ids:
+            assigned[index] = old_id
+            reused_ids.add(old_id)
+
+    # New IDs must not collide with any existing (or recently retired) station
+    used_station_ids = {station['station_id'] for station in old_stations}
+    by_old_id = {}
+    appended = []
+    for index, station in enumerate(rebuilt):
+        if index in assigned:
+            station['station_id'] = assigned[index]
+            by_old_id[assigned[index]] = station
+        else:
+            station['station_id'] = unique_station_id(station['station_id'], used_station_ids)
+            used_station_ids.add(station['station_id'])
+            appended.append(station)
+
+    # Keep untouched stations in place; rebuilt stations take their old station's position
+    replaced_ids = {station['station_id'] for station in replaced}
+    stations = []
+    for station in old_stations:
+        if station['station_id'] not in replaced_ids:
+            stations.append(station)
+        elif station['station_id'] in by_old_id:
+            stations.append(by_old_id[station['station_id']])
+    stations.extend(appended)
+
+    patch = {
+        'removed_station_ids': sorted(replaced_ids - reused_ids),
+        'stations': rebuilt
+    }
+    return stations, patch
+
+def main_incremental(output_file: str, patch_file: Optional[str] = None):
+    """
+    Patch output_file for changed feeds instead of rebuilding every station.
+    The stops already stored in output_file are the snapshot each feed is diffed against.
+    """
+    print("Station Consolidation Script (incremental)")
+    print("=" * 40)
+
+    if not os.path.exists(output_file):
+        print(f"{output_file} not found; run a full consolidation first.")
+        return
+
+    with open(output_file, 'r', encoding='utf-8') as f:
+        old_stations = json.load(f)
+
+    gtfs_feeds = discover_gtfs_feeds(GTFS_ROOT_DIR)
+    if not gtfs_feeds:
+        print("No GTFS feeds found! Make sure you have directories with stops.txt files.")
+        return
+
+    # Every row is compared against the snapshot, so work with stop dicts here
+    new_stops = list(load_all_stops(gtfs_feeds))
+
+    # Per-agency summary of what changed since the snapshot
+    old_stops = [stop for station in old_stations for stop in station['stops']]
+    agencies = sorted({stop['agency'] for stop in old_stops} | {stop['agency'] for stop in new_stops})
+    for agency in agencies:
+        added, removed, modified = diff_stops(
+            [stop for stop in old_stops if stop['agency'] == agency],
+            [stop for stop in new_stops if stop['agency'] == agency]
+        )
+        if added or removed or modified:
+            print(f"{agency}: {len(added)} added, {len(removed)} removed, {len(modified)} modified stops")
+        else:
+            print(f"{agency}: unchanged")
+
+    stations, patch = consolidate_incremental(old_stations, new_stops)
+    if not patch['stations'] and not patch['removed_station_ids']:
+        print("No stop changes; consolidated stations left as is.")
+        return
+
+    print(f"Rebuilt {len(patch['stations'])} stations, removed {len(patch['removed_station_ids'])}")
+    print(f"Total stations: {len(stations)}")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(stations, f, indent=2, ensure_ascii=False)
+    print(f"Saved consolidated stations to {output_file}")
+
+    if patch_file:
+        with open(patch_file, 'w', encoding='utf-8') as f:
+            json.dump(patch, f, indent=2, ensure_ascii=False)
+        print(f"Saved patch to {patch_file}")
+
 def main():
     """Main consolidation process."""
+    parser = argparse.ArgumentParser(description='Consolidate GTFS stops into stations')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only rebuild stations around stops that changed since the last run')
+    parser.add_argument('--patch-out', help='With --incremental, also write the changed stations to this file')
+    args = parser.parse_args()
+
+    if args.incremental:
+        main_incremental(OUTPUT_FILE, args.patch_out)
+        return
+
     print("Station Consolidation Script")
     print("=" * 40)
     
     # Discover all GTFS feeds
-    gtfs_root_dir = 'backend/data/GTFS'
+    gtfs_root_dir = GTFS_ROOT_DIR
     print(f"Discovering GTFS feeds in {gtfs_root_dir}...")
     gtfs_feeds = discover_gtfs_feeds(gtfs_root_dir)
     
@@ -306,18 +773,13 @@ def main():
     print(f"Found {len(gtfs_feeds)} GTFS feeds")
     
     # Load stops from all GTFS feeds
-    all_stops = []
-    
-    for agency_name, stops_file in gtfs_feeds:
-        stops = load_stops_from_gtfs(stops_file, agency_name)
-        all_stops.extend(stops)
-        print(f"Loaded {len(stops)} stops from {agency_name}")
+    all_stops = load_all_stops(gtfs_feeds)
     
     print(f"Total stops loaded: {len(all_stops)}")
     
     # Cluster stops by proximity
-    print("\nClustering stops by geographic proximity (200m radius)...")
-    proximity_clusters = cluster_stops_by_proximity(all_stops, max_distance=200)
+    print(f"\nClustering stops by geographic proximity ({CLUSTER_RADIUS}m radius)...")
+    proximity_clusters = cluster_stops_by_proximity(all_stops, max_distance=CLUSTER_RADIUS)
     print(f"Found {len(proximity_clusters)} geographic clusters")
     
     # Consolidate each cluster by name similarity
@@ -329,14 +791,8 @@ def main():
         stations = consolidate_cluster(cluster)
         # Ensure station IDs are unique
         for station in stations:
-            original_id = station['station_id']
-            unique_id = original_id
-            counter = 1
-            while unique_id in used_station_ids:
-                unique_id = f"{original_id}-{counter}"
-                counter += 1
-            station['station_id'] = unique_id
-            used_station_ids.add(unique_id)
+            station['station_id'] = unique_station_id(station['station_id'], used_station_ids)
+            used_station_ids.add(station['station_id'])
         all_stations.extend(stations)
     
     print(f"Created {len(all_stations)} consolidated stations")
@@ -351,7 +807,7 @@ def main():
         return
     
     # Save consolidated stations
-    output_file = 'backend/static/consolidated_stations.json'
+    output_file = OUTPUT_FILE
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_stations, f, indent=2, ensure_ascii=False)
     
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+OG Image Pre-render Script
+
+Renders the OpenGraph image for every consolidated station (plus the
+homepage default) across a process pool and writes them to a
+content-addressed directory. /api/og-image serves files from that directory
+directly (OG_PRERENDERED_DIR, default backend/static/og_images) instead of
+drawing them per request.
+
+File names are derived from the station name and og_generator.TEMPLATE_VERSION,
+so re-running after a layout change writes a fresh set. Existing files are
+skipped unless --force is given.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from og_generator import DEFAULT_STATION_NAME, OGImageGenerator, image_filename  # noqa: E402
+
+# One generator per worker process, so fonts and the logo are loaded once per worker
+_generator: Optional[OGImageGenerator] = None
+
+
+def _init_worker():
+    global _generator
+    _generator = OGImageGenerator(cache_size=0)
+
+
+def render_to_file(station_name: str, output_dir: str) -> str:
+    """Render station_name into output_dir and return the file name."""
+    filename = image_filename(station_name)
+    path = os.path.join(output_dir, filename)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temp_path, 'wb') as f:
+        f.write(_generator.render_station_image(station_name))
+    os.replace(temp_path, path)
+    return filename
+
+
+def station_names(stations_file: str) -> List[str]:
+    """Unique station names in file order, plus the homepage default."""
+    with open(stations_file, 'r', encoding='utf-8') as f:
+        stations = json.load(f)
+    names = [DEFAULT_STATION_NAME] + [station['station_name'] for station in stations]
+    return list(dict.fromkeys(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-render OG images for all consolidated stations')
+    parser.add_argument('--stations', default='backend/static/consolidated_stations.json')
+    parser.add_argument('--output', default='backend/static/og_images')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of render processes')
+    parser.add_argument('--force', action='store_true', help='Re-render images that already exist')
+    args = parser.parse_args()
+
+    print("OG Image Pre-render Script")
+    print("=" * 40)
+
+    names = station_names(args.stations)
+    os.makedirs(args.output, exist_ok=True)
+
+    if not args.force:
+        existing = set(os.listdir(args.output))
+        pending = [name for name in names if image_filename(name) not in existing]
+    else:
+        pending = names
+
+    print(f"Found {len(names)} station names, {len(pending)} to render into {args.output}")
+    if not pending:
+        return
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+        for done, _ in enumerate(executor.map(render_to_file, pending, [args.output] * len(pending), chunksize=16), 1):
+            if done % 100 == 0 or done == len(pending):
+                print(f"  Rendered {done}/{len(pending)}")
+
+    print(f"Rendered {len(pending)} images in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()